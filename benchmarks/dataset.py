@@ -0,0 +1,418 @@
+# Генератор синтетических данных для нагрузочных тестов.
+#
+# Заполняет все таблицы магазина строками, которые проходят ограничения
+# моделей (формат email, дата рождения не в будущем, уникальные slug, имена
+# и username, внешние ключи, оценка отзыва 1..5), и загружает их через
+# COPY параллельно несколькими процессами.
+#
+# Объём задаётся коэффициентом --scale: 1 = ROWS_PER_SCALE (миллион товаров),
+# --scale 10 - десять миллионов товаров и пропорционально остальное.
+# Дробный коэффициент годится для быстрых проверок (--scale 0.01).
+#
+# Генерация детерминирована: одинаковые --seed и --scale дают одинаковые
+# данные независимо от числа процессов. Каждая пачка строк использует свой
+# генератор случайных чисел, зависящий только от seed, таблицы и номера пачки;
+# цена товара - чистая функция от seed и id, поэтому позиции заказов и их
+# суммы согласованы с товарами без обращения к БД.
+#
+# Как достигается скорость:
+# - строки формируются текстом (формат COPY text) и отправляются
+#   copy_to_table пачками по CHUNK_SIZE, по отдельному соединению на процесс;
+# - таблицы загружаются по фазам в порядке внешних ключей, внутри фазы
+#   пачки идут параллельно (--jobs процессов);
+# - отзывы генерируются вместе со своими товарами, и агрегаты рейтинга
+#   (rating_count, rating_sum, rating_1..5) записываются сразу -
+#   пересчёт RECALCULATE_RATINGS_SQL после загрузки не нужен;
+#   search_vector - генерируемая колонка, Postgres заполняет её сам;
+# - вторичные индексы (кроме первичных ключей и уникальных ограничений) на
+#   время загрузки удаляются и затем создаются заново параллельно - это
+#   быстрее, чем обновлять их на каждую строку (--keep-indexes отключает);
+# - synchronous_commit = off на соединениях загрузки.
+#
+# id задаются явно (у позиций заказов и отзывов - id родителя * 8 + номер),
+# после загрузки последовательности SERIAL сдвигаются на max(id).
+#
+# Запуск (схема должна быть создана: alembic upgrade head):
+#     python -m benchmarks.dataset --scale 1 --jobs 8
+#     python -m benchmarks.dataset --scale 10 --truncate
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+# Строк на единицу --scale
+ROWS_PER_SCALE = {
+    "categories": 1_000,
+    "users": 200_000,
+    "products": 1_000_000,
+    "orders": 300_000,
+}
+# Сколько строк генерирует и загружает одна задача
+CHUNK_SIZE = 50_000
+# Отзывов на товар и позиций на заказ (равновероятный выбор; в среднем ~1.7 и 2.5)
+REVIEWS_PER_PRODUCT = (0, 0, 1, 1, 2, 3, 5)
+ITEMS_PER_ORDER = (1, 1, 2, 3, 4, 4)
+# Множитель id для дочерних строк: id = id родителя * CHILD_ID_FACTOR + номер
+CHILD_ID_FACTOR = 8
+
+TABLES = ("categories", "users", "products", "reviews", "orders", "order_items")
+# Порядок загрузки: внутри фазы пачки независимы, фазы - по внешним ключам
+PHASES = (("categories", "users"), ("products",), ("orders",))
+
+COLUMNS = {
+    "categories": ("id", "name", "slug", "description"),
+    "users": ("id", "username", "firstname", "last_name", "birthday", "email", "hashed_password",
+              "is_active", "created_at", "uuid"),
+    "products": ("id", "name", "slug", "description", "price", "discount_price", "stock", "is_active",
+                 "created_at", "updated_at", "category_id", "rating_count", "rating_sum",
+                 "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"),
+    "reviews": ("id", "rating", "text", "created_at", "user_id", "product_id"),
+    "orders": ("id", "status", "total_amount", "created_at", "address", "phone", "user_id"),
+    "order_items": ("id", "quantity", "price", "order_id", "product_id"),
+}
+
+FIRST_NAMES = ("Иван", "Анна", "Сергей", "Мария", "Алексей", "Ольга", "Дмитрий", "Елена", "Павел", "Наталья",
+               "John", "Emma", "Michael", "Olivia", "David", "Sophia")
+LAST_NAMES = ("Иванов", "Смирнова", "Кузнецов", "Попова", "Соколов", "Лебедева", "Козлов", "Новикова",
+              "Морозов", "Волкова", "Smith", "Johnson", "Brown", "Miller", "Wilson")
+BRANDS = ("Apple", "Samsung", "Xiaomi", "Lenovo", "Asus", "Sony", "LG", "Huawei", "Acer", "Dell", "Philips", "Bosch")
+NOUNS = ("Смартфон", "Ноутбук", "Планшет", "Наушники", "Монитор", "Телевизор", "Фотоаппарат", "Умные часы",
+         "Колонка", "Роутер", "Клавиатура", "Мышь", "Пылесос", "Кофемашина")
+ADJECTIVES = ("беспроводной", "игровой", "компактный", "профессиональный", "ультратонкий", "водонепроницаемый",
+              "wireless", "gaming", "portable", "pro")
+DESCRIPTION_WORDS = ("быстрый", "надёжный", "экран", "батарея", "процессор", "память", "камера", "звук",
+                     "гарантия", "доставка", "display", "battery", "fast", "storage", "premium", "design")
+REVIEW_TEXTS = ("Отличный товар", "Всё работает", "Качество так себе", "Рекомендую", "Не понравилось",
+                "Great value", "Works as expected", None, None)
+ORDER_STATUSES = ("created", "paid", "shipped", "delivered", "delivered", "delivered", "cancelled")
+CITIES = ("Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург", "Самара")
+
+BASE_TIME = datetime(2023, 1, 1)
+PERIOD_SECONDS = 2 * 365 * 24 * 3600  # Даты создания - в пределах двух лет от BASE_TIME
+BIRTHDAY_FROM = date(1950, 1, 1)
+BIRTHDAY_DAYS = (date(2007, 1, 1) - BIRTHDAY_FROM).days
+NULL = "\\N"
+
+
+def row_counts(scale: float) -> dict[str, int]:
+    return {table: max(1, int(rows * scale)) for table, rows in ROWS_PER_SCALE.items()}
+
+
+def _rng(seed: int, table: str, chunk: int) -> random.Random:
+    # Только целые числа: hash() строк рандомизирован между процессами
+    return random.Random(seed * 1_000_003 + TABLES.index(table) * 1_000_000_007 + chunk)
+
+
+def _mix(seed: int, value: int) -> int:
+    """Детерминированное 32-битное перемешивание (быстрее отдельного Random на строку)."""
+    h = (value * 2654435761 + seed * 97531) & 0xFFFFFFFF
+    h ^= h >> 16
+    h = (h * 0x45D9F3B) & 0xFFFFFFFF
+    return h ^ (h >> 16)
+
+
+def product_prices(seed: int, product_id: int) -> tuple[int, int | None]:
+    """(цена, цена со скидкой) товара в копейках; скидка всегда меньше цены."""
+    h = _mix(seed, product_id)
+    price = 10_000 + h % 20_000_000  # 100.00 .. 200 099.99
+    if h % 5 == 0:
+        return price, price * (70 + (h >> 8) % 25) // 100
+    return price, None
+
+
+def _money(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def _timestamp(rng: random.Random) -> str:
+    return (BASE_TIME + timedelta(seconds=rng.randrange(PERIOD_SECONDS))).isoformat(sep=" ")
+
+
+def _line(values) -> str:
+    return "\t".join(values) + "\n"
+
+
+# Цифры в названии категории запрещены (NameStr: буквы, пробелы, дефисы),
+# поэтому уникальный номер записывается буквами: 31 -> "гб"
+CATEGORY_DIGITS = "абвгдежзик"
+
+
+def category_name(category_id: int) -> str:
+    return f"Категория {''.join(CATEGORY_DIGITS[int(d)] for d in str(category_id))}"
+
+
+def generate_categories(seed: int, chunk: int, start: int, stop: int, counts: dict) -> dict[str, str]:
+    rng = _rng(seed, "categories", chunk)
+    lines = []
+    for category_id in range(start, stop):
+        words = " ".join(rng.choice(DESCRIPTION_WORDS) for _ in range(8))
+        lines.append(_line((str(category_id), category_name(category_id), f"category-{category_id}", words)))
+    return {"categories": "".join(lines)}
+
+
+def generate_users(seed: int, chunk: int, start: int, stop: int, counts: dict,
+                   password_hash: str) -> dict[str, str]:
+    rng = _rng(seed, "users", chunk)
+    lines = []
+    for user_id in range(start, stop):
+        username = f"user_{user_id}"
+        lines.append(_line((
+            str(user_id),
+            username,
+            rng.choice(FIRST_NAMES),
+            rng.choice(LAST_NAMES),
+            (BIRTHDAY_FROM + timedelta(days=rng.randrange(BIRTHDAY_DAYS))).isoformat(),
+            f"{username}@example.com",
+            password_hash,
+            "f" if rng.random() < 0.02 else "t",
+            (BASE_TIME.date() + timedelta(days=rng.randrange(PERIOD_SECONDS // 86400))).isoformat(),
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        )))
+    return {"users": "".join(lines)}
+
+
+def generate_products(seed: int, chunk: int, start: int, stop: int, counts: dict) -> dict[str, str]:
+    """Товары вместе с их отзывами; агрегаты рейтинга считаются здесь же."""
+    rng = _rng(seed, "products", chunk)
+    users, categories = counts["users"], counts["categories"]
+    products, reviews = [], []
+    for product_id in range(start, stop):
+        created_at = _timestamp(rng)
+        histogram = [0] * 5
+        for n in range(rng.choice(REVIEWS_PER_PRODUCT)):
+            rating = rng.choices((1, 2, 3, 4, 5), weights=(5, 5, 10, 30, 50))[0]
+            histogram[rating - 1] += 1
+            text = rng.choice(REVIEW_TEXTS)
+            reviews.append(_line((
+                str(product_id * CHILD_ID_FACTOR + n),
+                str(rating),
+                text if text is not None else NULL,
+                _timestamp(rng),
+                str(rng.randint(1, users)),
+                str(product_id),
+            )))
+
+        price, discount = product_prices(seed, product_id)
+        name = f"{rng.choice(NOUNS)} {rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {product_id}"
+        description = " ".join(rng.choice(DESCRIPTION_WORDS) for _ in range(rng.randint(10, 40)))
+        products.append(_line((
+            str(product_id),
+            name,
+            f"product-{product_id}",
+            description,
+            _money(price),
+            _money(discount) if discount is not None else NULL,
+            str(rng.randint(0, 500) if rng.random() < 0.9 else 0),
+            "f" if rng.random() < 0.05 else "t",
+            created_at,
+            created_at,
+            str(rng.randint(1, categories)),
+            str(sum(histogram)),
+            str(sum(rating * n for rating, n in enumerate(histogram, start=1))),
+            *map(str, histogram),
+        )))
+    return {"products": "".join(products), "reviews": "".join(reviews)}
+
+
+def generate_orders(seed: int, chunk: int, start: int, stop: int, counts: dict) -> dict[str, str]:
+    """Заказы вместе с позициями; сумма заказа - по фактическим ценам товаров."""
+    rng = _rng(seed, "orders", chunk)
+    users, products = counts["users"], counts["products"]
+    orders, items = [], []
+    for order_id in range(start, stop):
+        total = 0
+        for n in range(rng.choice(ITEMS_PER_ORDER)):
+            product_id = rng.randint(1, products)
+            quantity = rng.randint(1, 3)
+            price, discount = product_prices(seed, product_id)
+            price = discount if discount is not None else price
+            total += price * quantity
+            items.append(_line((
+                str(order_id * CHILD_ID_FACTOR + n),
+                str(quantity),
+                _money(price),
+                str(order_id),
+                str(product_id),
+            )))
+        orders.append(_line((
+            str(order_id),
+            rng.choice(ORDER_STATUSES),
+            _money(total),
+            _timestamp(rng),
+            f"г. {rng.choice(CITIES)}, ул. Тестовая, д. {rng.randint(1, 200)}, кв. {rng.randint(1, 500)}",
+            f"+79{rng.randrange(10 ** 9):09d}",
+            str(rng.randint(1, users)),
+        )))
+    return {"orders": "".join(orders), "order_items": "".join(items)}
+
+
+GENERATORS = {
+    "categories": generate_categories,
+    "users": generate_users,
+    "products": generate_products,
+    "orders": generate_orders,
+}
+
+
+# --- Загрузка ---
+
+def asyncpg_dsn(url: str) -> str:
+    """URL SQLAlchemy (postgresql+asyncpg://...) -> DSN asyncpg (postgresql://...)."""
+    from sqlalchemy.engine import make_url
+
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+async def _copy_chunk(dsn: str, tables: dict[str, str]) -> int:
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute("SET synchronous_commit = off")
+        async with conn.transaction():
+            # Родительская таблица первой: дочерние строки ссылаются на неё в той же транзакции
+            for table, data in tables.items():
+                if data:
+                    await conn.copy_to_table(table, source=io.BytesIO(data.encode()), columns=COLUMNS[table],
+                                             format="text")
+    finally:
+        await conn.close()
+    return sum(data.count("\n") for data in tables.values())
+
+
+def load_chunk(dsn: str, table: str, seed: int, chunk: int, start: int, stop: int, counts: dict,
+               extra: tuple) -> int:
+    """Задача процесса: сгенерировать пачку (и её дочерние строки) и загрузить через COPY."""
+    tables = GENERATORS[table](seed, chunk, start, stop, counts, *extra)
+    return asyncio.run(_copy_chunk(dsn, tables))
+
+
+SECONDARY_INDEXES_SQL = """
+    SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS ddl
+    FROM pg_index i
+    JOIN pg_class t ON t.oid = i.indrelid
+    WHERE t.relname = ANY($1::text[])
+      AND t.relnamespace = 'public'::regnamespace
+      AND NOT i.indisprimary
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+"""
+
+
+async def _prepare(dsn: str, truncate: bool, keep_indexes: bool) -> list[tuple[str, str]]:
+    """Проверяет/очищает таблицы и снимает вторичные индексы. Возвращает их DDL для восстановления."""
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        if truncate:
+            await conn.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+        else:
+            for table in TABLES:
+                if await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {table})"):
+                    raise SystemExit(f"Таблица {table} не пуста: id пересекутся. Запустите с --truncate")
+        if keep_indexes:
+            return []
+        indexes = [(r["name"], r["ddl"]) for r in await conn.fetch(SECONDARY_INDEXES_SQL, list(TABLES))]
+        for name, ddl in indexes:
+            # DDL печатаем заранее: если загрузка прервётся, индексы можно создать вручную
+            print(f"Снимаем индекс на время загрузки: {ddl};")
+            await conn.execute(f"DROP INDEX {name}")
+        return indexes
+    finally:
+        await conn.close()
+
+
+async def _create_index(dsn: str, ddl: str) -> None:
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute("SET maintenance_work_mem = '512MB'")
+        await conn.execute(ddl)
+    finally:
+        await conn.close()
+
+
+async def _finish(dsn: str, indexes: list[tuple[str, str]], jobs: int) -> None:
+    """Восстанавливает индексы (параллельно), сдвигает последовательности и обновляет статистику."""
+    import asyncpg
+
+    from database.notifications import notify_raw
+
+    semaphore = asyncio.Semaphore(jobs)
+
+    async def create(ddl: str) -> None:
+        async with semaphore:
+            await _create_index(dsn, ddl)
+
+    await asyncio.gather(*(create(ddl) for _, ddl in indexes))
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        for table in TABLES:
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+            )
+        await conn.execute(f"ANALYZE {', '.join(TABLES)}")
+        # Запущенное приложение сбрасывает кэши (см. cache/bus.py)
+        for entity in ("categories", "products", "users"):
+            await notify_raw(conn, entity)
+    finally:
+        await conn.close()
+
+
+def _chunks(total: int) -> list[tuple[int, int, int]]:
+    """(номер пачки, первый id, id после последнего) для id 1..total."""
+    return [(n, start, min(start + CHUNK_SIZE, total + 1)) for n, start in enumerate(range(1, total + 1, CHUNK_SIZE))]
+
+
+def run(dsn: str, scale: float, seed: int, jobs: int, truncate: bool, keep_indexes: bool) -> None:
+    from security import hash_password_sync
+
+    counts = row_counts(scale)
+    print(f"Строк: {counts} (+ отзывы и позиции заказов), процессов: {jobs}, seed: {seed}")
+    # Один настоящий хеш на всех: пользователи могут входить с паролем "password"
+    extra = {"users": (hash_password_sync("password"),)}
+
+    started = time.perf_counter()
+    indexes = asyncio.run(_prepare(dsn, truncate, keep_indexes))
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for phase in PHASES:
+                phase_started = time.perf_counter()
+                futures = [
+                    pool.submit(load_chunk, dsn, table, seed, chunk, start, stop, counts, extra.get(table, ()))
+                    for table in phase
+                    for chunk, start, stop in _chunks(counts[table])
+                ]
+                rows = sum(f.result() for f in futures)
+                elapsed = time.perf_counter() - phase_started
+                print(f"{', '.join(phase)}: {rows} строк за {elapsed:.1f} с ({rows / elapsed:,.0f} строк/с)")
+    finally:
+        index_started = time.perf_counter()
+        asyncio.run(_finish(dsn, indexes, jobs))
+        print(f"Индексы, последовательности, ANALYZE: {time.perf_counter() - index_started:.1f} с")
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных для нагрузочных тестов")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help=f"Коэффициент объёма: 1 = {ROWS_PER_SCALE['products']:,} товаров")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора (одинаковое - одинаковые данные)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Параллельных процессов загрузки")
+    parser.add_argument("--truncate", action="store_true", help="Очистить таблицы перед загрузкой")
+    parser.add_argument("--keep-indexes", action="store_true", help="Не снимать вторичные индексы на время загрузки")
+    args = parser.parse_args()
+
+    from settings import settings
+
+    if CHILD_ID_FACTOR <= max(max(REVIEWS_PER_PRODUCT), max(ITEMS_PER_ORDER)):
+        sys.exit("CHILD_ID_FACTOR должен быть больше числа дочерних строк")
+    run(asyncpg_dsn(settings.database.url), args.scale, args.seed, args.jobs, args.truncate, args.keep_indexes)
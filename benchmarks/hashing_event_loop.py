@@ -0,0 +1,69 @@
+# Задержка цикла событий во время всплеска регистраций.
+#
+# Параллельно с N хешированиями паролей работает «зонд»: он каждые 5 мс
+# засыпает и измеряет, насколько позже запланированного проснулся. Это и есть
+# задержка, которую в этот момент получил бы любой другой запрос воркера.
+#
+# Сравниваются два режима:
+# - inline: hash_password_sync прямо в корутине (как если бы KDF вызывался синхронно)
+# - pool:   security.hash_password (пул потоков)
+#
+# Запуск:
+#     python -m benchmarks.hashing_event_loop --registrations 50
+import argparse
+import asyncio
+import statistics
+import time
+
+import security
+
+PROBE_INTERVAL = 0.005
+
+
+async def _probe(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def _inline_hash(password: str) -> str:
+    return security.hash_password_sync(password)
+
+
+async def _run(mode: str, registrations: int) -> dict:
+    hasher = security.hash_password if mode == "pool" else _inline_hash
+    stop, lags = asyncio.Event(), []
+    probe = asyncio.create_task(_probe(stop, lags))
+    await asyncio.sleep(PROBE_INTERVAL * 4)  # Разогрев зонда
+
+    started = time.perf_counter()
+    await asyncio.gather(*(hasher(f"password-{i}") for i in range(registrations)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    lags.sort()
+    return {
+        "mode": mode,
+        "registrations": registrations,
+        "total_s": round(elapsed, 3),
+        "loop_lag_p50_ms": round(statistics.median(lags), 2),
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1 if len(lags) > 1 else 0], 2),
+        "loop_lag_max_ms": round(lags[-1], 2),
+    }
+
+
+async def main(registrations: int) -> None:
+    print(f"scrypt n={security.SCRYPT_N} r={security.SCRYPT_R} p={security.SCRYPT_P}, "
+          f"потоков хеширования: {security.HASH_WORKERS}")
+    for mode in ("inline", "pool"):
+        print(await _run(mode, registrations))
+    security.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка цикла событий во время всплеска регистраций")
+    parser.add_argument("--registrations", type=int, default=50, help="Сколько регистраций одновременно")
+    args = parser.parse_args()
+    asyncio.run(main(args.registrations))
@@ -0,0 +1,160 @@
+# Пропускная способность списков: response_model против готового JSON.
+#
+# Сравниваются два способа отдать страницу списка:
+# - before: обработчик возвращает объекты, FastAPI валидирует их по
+#   response_model, превращает в dict и кодирует стандартным json
+#   (так работали get_products и get_users);
+# - after:  routers.serialization - один проход TypeAdapter и dump_json,
+#   обработчик возвращает готовый Response.
+#
+# Сценарии:
+# - products:        страница ORM-объектов Product с категорией (промах кэша)
+# - products_cached: страница из кэша каталога (before - провалидированные
+#                    схемы, after - готовые байты)
+# - users:           страница ORM-объектов User; почти всё время - проверка
+#                    EmailStr в UserInDB, она одинакова в обоих способах
+#
+# БД не нужна: приложение вызывается напрямую через ASGI, поэтому замер
+# показывает только стоимость фреймворка и сериализации - то, что и меняется.
+#
+# Запуск:
+#     python -m benchmarks.json_responses --rows 100 --requests 2000
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi import FastAPI
+
+from database.models import Category, Product, User
+from routers.serialization import dump_list, json_response
+from schemas.relations import ProductWithCategory
+from schemas.user import UserInDB
+
+
+def _products(rows: int) -> list[Product]:
+    category = Category(id=1, name="Электроника", slug="electronics", description="Смартфоны и ноутбуки")
+    products = []
+    for i in range(1, rows + 1):
+        product = Product(
+            id=i,
+            name=f"Смартфон модель {i}",
+            slug=f"smartphone-{i}",
+            description="Подробное описание товара. " * 10,
+            price=Decimal("49990.00") + i,
+            discount_price=Decimal("44990.00") + i if i % 3 == 0 else None,
+            stock=i % 50,
+            is_active=True,
+            created_at=datetime(2025, 1, 1) + timedelta(minutes=i),
+            updated_at=datetime(2025, 6, 1) + timedelta(minutes=i),
+            category_id=category.id,
+            rating_count=i % 40,
+            rating_1=1, rating_2=2, rating_3=3, rating_4=4, rating_5=i % 40 - 10 if i % 40 > 10 else 0,
+        )
+        product.rating_average = 4.25
+        product.category = category
+        products.append(product)
+    return products
+
+
+def _users(rows: int) -> list[User]:
+    return [
+        User(
+            id=i,
+            username=f"user_{i}",
+            email=f"user_{i}@example.com",
+            firstname="Иван",
+            last_name="Петров",
+            birthday=date(1990, 1, 1) + timedelta(days=i),
+            hashed_password="scrypt$16384$8$1$c2FsdA==$aGFzaA==",
+            is_active=True,
+            created_at=date(2025, 1, 1),
+        )
+        for i in range(1, rows + 1)
+    ]
+
+
+def build_app(rows: int) -> FastAPI:
+    products, users = _products(rows), _users(rows)
+    cached_models = [ProductWithCategory.model_validate(p) for p in products]
+    cached_body = dump_list(ProductWithCategory, products)
+    app = FastAPI()
+
+    @app.get("/before/products", response_model=list[ProductWithCategory])
+    async def products_before():
+        return products
+
+    @app.get("/after/products", response_model=list[ProductWithCategory])
+    async def products_after():
+        return json_response(dump_list(ProductWithCategory, products))
+
+    @app.get("/before/products_cached", response_model=list[ProductWithCategory])
+    async def products_cached_before():
+        return cached_models
+
+    @app.get("/after/products_cached", response_model=list[ProductWithCategory])
+    async def products_cached_after():
+        return json_response(cached_body)
+
+    @app.get("/before/users", response_model=list[UserInDB])
+    async def users_before():
+        return users
+
+    @app.get("/after/users", response_model=list[UserInDB])
+    async def users_after():
+        return json_response(dump_list(UserInDB, users))
+
+    return app
+
+
+async def _call(app: FastAPI, path: str) -> bytes:
+    """Один GET-запрос к приложению напрямую через ASGI."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def _measure(app: FastAPI, path: str, requests: int) -> float:
+    for _ in range(min(50, requests)):  # Разогрев
+        await _call(app, path)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await _call(app, path)
+    return requests / (time.perf_counter() - started)
+
+
+async def main(rows: int, requests: int) -> None:
+    app = build_app(rows)
+    print(f"Строк на странице: {rows}, запросов на замер: {requests}")
+    for scenario in ("products", "products_cached", "users"):
+        before = await _measure(app, f"/before/{scenario}", requests)
+        after = await _measure(app, f"/after/{scenario}", requests)
+        print({
+            "scenario": scenario,
+            "before_rps": round(before, 1),
+            "after_rps": round(after, 1),
+            "speedup": round(after / before, 2),
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пропускная способность списков: response_model против готового JSON")
+    parser.add_argument("--rows", type=int, default=100, help="Строк на странице")
+    parser.add_argument("--requests", type=int, default=2000, help="Запросов на каждый замер")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests))
@@ -0,0 +1,343 @@
+# Нагрузочный тест API.
+#
+# Запускает main:app под uvicorn против локального Postgres (DATABASE_URL
+# из окружения или .env), применяет миграции, при необходимости досеивает
+# немного данных и прогоняет сценарии с фиксированным числом одновременных
+# клиентов:
+# - products_read: GET /products/products
+# - users_read:    GET /users/
+# - users_write:   POST /users/ (уникальные пользователи, включает хеширование пароля)
+#
+# Для каждого сценария считаются req/s, p50/p95/p99/max задержки и ошибки
+# по статусам. Отчёт (вместе с коммитом и версиями зависимостей) пишется
+# в JSON, чтобы сравнивать прогоны между коммитами и обновлениями
+# fastapi/SQLAlchemy:
+#     python -m benchmarks.load --duration 30 --concurrency 32
+#     python -m benchmarks.load --compare benchmarks/results/load-<старый коммит>.json
+#
+# Уже запущенный сервер: --url http://127.0.0.1:8190 (миграции и сидинг пропускаются).
+# HTTP-клиент - минимальный HTTP/1.1 с keep-alive на asyncio, без зависимостей.
+# Клиент работает в одном процессе; если он упирается в CPU раньше сервера
+# (видно по загрузке ядра), уменьшите --concurrency или запустите несколько копий.
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+# Сколько строк досеивать, если таблицы пустые (для больших объёмов - python -m benchmarks.dataset)
+SEED_PRODUCTS = 1000
+SEED_USERS = 1000
+
+SCENARIOS = ("products_read", "users_read", "users_write")
+
+# Пакеты, версии которых попадают в отчёт
+TRACKED_PACKAGES = ("fastapi", "starlette", "pydantic", "pydantic_core", "SQLAlchemy", "asyncpg", "uvicorn")
+
+
+class HTTPConnection:
+    """Одно keep-alive соединение HTTP/1.1."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def _connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes | None = None) -> tuple[int, bytes]:
+        """Выполняет запрос и возвращает (статус, тело). При обрыве соединения переподключается один раз."""
+        for attempt in (1, 2):
+            if self.writer is None:
+                await self._connect()
+            try:
+                return await self._request(method, path, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt == 2:
+                    raise
+
+    async def _request(self, method: str, path: str, body: bytes | None) -> tuple[int, bytes]:
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        if body is not None:
+            head += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + (body or b""))
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split(b" ", 2)[1])
+        headers = {}
+        while (line := await self.reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while size := int((await self.reader.readuntil(b"\r\n")).strip(), 16):
+                chunks.append(await self.reader.readexactly(size + 2))
+            await self.reader.readuntil(b"\r\n")
+            payload = b"".join(chunk[:-2] for chunk in chunks)
+        else:
+            payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection") == "close":
+            await self.close()
+        return status, payload
+
+
+def _user_payload(run_id: str, n: int) -> bytes:
+    username = f"load_{run_id}_{n}"
+    return json.dumps({
+        "username": username,
+        "email": f"{username}@example.com",
+        "firstname": "Иван",
+        "last_name": "Петров",
+        "birthday": "1990-01-01",
+        "password": "password",
+    }).encode()
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[max(math.ceil(q * len(values)) - 1, 0)]
+
+
+async def run_scenario(host: str, port: int, scenario: str, concurrency: int,
+                       duration: float, warmup: float) -> dict:
+    """Гоняет сценарий concurrency клиентами: warmup секунд без учёта, затем duration секунд с замером."""
+    run_id = uuid.uuid4().hex[:8]
+    counter = iter(range(10 ** 12))
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def next_request() -> tuple[str, str, bytes | None]:
+        if scenario == "products_read":
+            return "GET", "/products/products?limit=20", None
+        if scenario == "users_read":
+            return "GET", "/users/?limit=20", None
+        return "POST", "/users/", _user_payload(run_id, next(counter))
+
+    async def client() -> None:
+        conn = HTTPConnection(host, port)
+        try:
+            while (now := time.perf_counter()) < deadline:
+                method, path, body = next_request()
+                try:
+                    status, _ = await conn.request(method, path, body)
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    status = 0  # Соединение оборвалось
+                finished = time.perf_counter()
+                if now >= measure_from:
+                    latencies.append(finished - now)
+                    statuses[status] += 1
+        finally:
+            await conn.close()
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    latencies.sort()
+    errors = {str(status): count for status, count in statuses.items() if not 200 <= status < 300}
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / duration, 1),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+
+# --- Подготовка окружения ---
+
+SEED_SQL = [
+    """
+    INSERT INTO categories (name, slug, description)
+    VALUES ('Нагрузочный тест', 'load-test', 'Товары для нагрузочного теста')
+    ON CONFLICT DO NOTHING
+    """,
+    f"""
+    INSERT INTO products (name, slug, description, price, stock, is_active, created_at, updated_at, category_id)
+    SELECT 'Товар ' || i, 'load-test-product-' || i, 'Описание товара ' || i,
+           100 + i % 1000, i % 50, true, now() - i * interval '1 minute', now(),
+           (SELECT id FROM categories WHERE slug = 'load-test')
+    FROM generate_series(1, {SEED_PRODUCTS}) AS i
+    ON CONFLICT DO NOTHING
+    """,
+    f"""
+    INSERT INTO users (username, firstname, last_name, birthday, email, hashed_password, is_active, created_at, uuid)
+    SELECT 'load_seed_' || i, 'Иван', 'Петров', date '1990-01-01' + i % 5000,
+           'load_seed_' || i || '@example.com', 'hashed_password', true, current_date, gen_random_uuid()
+    FROM generate_series(1, {SEED_USERS}) AS i
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+
+async def seed_if_empty() -> None:
+    """Досеивает немного товаров и пользователей, если их нет (чтение пустых таблиц мерить бессмысленно)."""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from settings import settings
+
+    engine = create_async_engine(settings.database.url, poolclass=NullPool)
+    try:
+        async with engine.begin() as conn:
+            has_products = (await conn.execute(text("SELECT EXISTS (SELECT 1 FROM products)"))).scalar()
+            has_users = (await conn.execute(text("SELECT EXISTS (SELECT 1 FROM users)"))).scalar()
+            if has_products and has_users:
+                return
+            print("Таблицы пустые - добавляем тестовые данные")
+            for statement in SEED_SQL:
+                await conn.execute(text(statement))
+    finally:
+        await engine.dispose()
+
+
+def migrate() -> None:
+    """Применяет миграции (alembic upgrade head): схема нужна и для досева, и для сервера."""
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True)
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    """Запускает uvicorn main:app (схема должна быть уже обновлена - см. migrate)."""
+    env = {**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--no-access-log"],
+        cwd=ROOT, env=env
+    )
+
+
+async def wait_ready(host: str, port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = HTTPConnection(host, port)
+        try:
+            status, _ = await conn.request("GET", "/db/pool")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            await conn.close()
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Сервер не поднялся за {timeout} с")
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _versions() -> dict:
+    versions = {"python": platform.python_version()}
+    for package in TRACKED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def print_comparison(report: dict, baseline: dict) -> None:
+    """Изменения req/s и p99 относительно прошлого отчёта."""
+    before = {r["scenario"]: r for r in baseline["results"]}
+    print(f"\nСравнение с {baseline.get('commit', '?')[:12]}:")
+    for result in report["results"]:
+        old = before.get(result["scenario"])
+        if old is None or not old["rps"]:
+            continue
+        rps_change = (result["rps"] / old["rps"] - 1) * 100
+        p99_old, p99_new = old["latency_ms"]["p99"], result["latency_ms"]["p99"]
+        print(f"  {result['scenario']:14} req/s {old['rps']:>9} -> {result['rps']:>9} ({rps_change:+.1f}%), "
+              f"p99 {p99_old} -> {p99_new} мс")
+
+
+async def main(args) -> dict:
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", args.port
+        # Сначала миграции: на пустой БД досев упал бы без таблиц
+        migrate()
+        if args.seed:
+            await seed_if_empty()
+        server = start_server(port, args.workers)
+    try:
+        await wait_ready(host, port)
+        results = []
+        for scenario in args.scenarios:
+            result = await run_scenario(host, port, scenario, args.concurrency, args.duration, args.warmup)
+            print(json.dumps(result, ensure_ascii=False))
+            results.append(result)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "versions": _versions(),
+        "server": {"url": args.url, "workers": None if args.url else args.workers},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32, help="Одновременных клиентов")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность замера сценария, с")
+    parser.add_argument("--warmup", type=float, default=5, help="Разогрев перед замером, с")
+    parser.add_argument("--workers", type=int, default=1, help="Воркеров uvicorn")
+    parser.add_argument("--port", type=int, default=8191, help="Порт запускаемого сервера")
+    parser.add_argument("--url", default=None, help="Адрес уже запущенного сервера (без запуска и миграций)")
+    parser.add_argument("--no-seed", dest="seed", action="store_false", help="Не добавлять тестовые данные")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Файл отчёта (по умолчанию benchmarks/results/load-<коммит>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="Отчёт прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = args.output or RESULTS_DIR / f"load-{(report['commit'] or 'unknown')[:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Отчёт: {output}")
+    if args.compare:
+        print_comparison(report, json.loads(args.compare.read_text()))
@@ -0,0 +1,134 @@
+# Время холодного старта воркера и разбивка по модулям.
+#
+# Каждый прогон - отдельный процесс python -X importtime, который
+# импортирует main и подключает роутеры (то же, что делает воркер uvicorn
+# до первого запроса, без обращения к БД). Отчёт:
+# - import main и подключение роутеров, мс (медиана по прогонам);
+# - собственное время импорта по пакетам верхнего уровня (fastapi, sqlalchemy, schemas, ...);
+# - самые медленные модули по собственному и накопленному времени.
+#
+# С --budget-ms скрипт завершается с кодом 1, если медиана полного старта
+# превышает бюджет - так его можно запускать в CI:
+#     python -m benchmarks.startup --runs 5 --budget-ms 1500
+#
+# --json сохраняет отчёт в файл (например, чтобы сравнивать между коммитами).
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Выполняется в дочернем процессе; время пишется в stdout, importtime - в stderr
+CHILD_CODE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.include_routers(main.app)
+registered = time.perf_counter()
+print(json.dumps({
+    "import_main_ms": (imported - started) * 1000,
+    "include_routers_ms": (registered - imported) * 1000,
+}))
+"""
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Строки 'import time: self | cumulative | name' -> (модуль, self мкс, cumulative мкс)."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def _run_once() -> tuple[dict, list[tuple[str, int, int]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_CODE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, _parse_importtime(result.stderr)
+
+
+def measure(runs: int, top: int) -> dict:
+    _run_once()  # Прогрев: компиляция .pyc и файловый кэш ОС не должны попасть в замер
+    samples = [_run_once() for _ in range(runs)]
+
+    import_main = statistics.median(t["import_main_ms"] for t, _ in samples)
+    include_routers = statistics.median(t["include_routers_ms"] for t, _ in samples)
+    total = statistics.median(t["import_main_ms"] + t["include_routers_ms"] for t, _ in samples)
+
+    # Разбивка берётся из прогона с медианным полным временем
+    ordered = sorted(samples, key=lambda s: s[0]["import_main_ms"] + s[0]["include_routers_ms"])
+    modules = ordered[len(ordered) // 2][1]
+
+    by_package = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+
+    return {
+        "runs": runs,
+        "import_main_ms": round(import_main, 1),
+        "include_routers_ms": round(include_routers, 1),
+        "total_ms": round(total, 1),
+        "packages_self_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(by_package.items(), key=lambda item: -item[1])[:top]
+        },
+        "slowest_self_ms": {
+            name: round(self_us / 1000, 1)
+            for name, self_us, _ in sorted(modules, key=lambda m: -m[1])[:top]
+        },
+        "slowest_cumulative_ms": {
+            name: round(cumulative_us / 1000, 1)
+            for name, _, cumulative_us in sorted(modules, key=lambda m: -m[2])[:top]
+        },
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(f"Прогонов: {report['runs']} (медиана)")
+    print(f"  {'import main:':22}{report['import_main_ms']:8.1f} мс")
+    print(f"  {'подключение роутеров:':22}{report['include_routers_ms']:8.1f} мс")
+    print(f"  {'всего:':22}{report['total_ms']:8.1f} мс")
+    for title, key in (
+            ("Собственное время по пакетам", "packages_self_ms"),
+            ("Самые медленные модули (собственное время)", "slowest_self_ms"),
+            ("Самые медленные модули (с зависимостями)", "slowest_cumulative_ms"),
+    ):
+        print(f"\n{title}:")
+        for name, ms in report[key].items():
+            print(f"  {ms:8.1f} мс  {name}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Время холодного старта воркера и разбивка по модулям")
+    parser.add_argument("--runs", type=int, default=5, help="Сколько процессов запустить")
+    parser.add_argument("--top", type=int, default=15, help="Сколько строк выводить в каждом разделе")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Допустимое время старта (import main + роутеры); превышение - код возврата 1")
+    parser.add_argument("--json", type=Path, default=None, help="Сохранить отчёт в JSON-файл")
+    args = parser.parse_args()
+
+    report = measure(args.runs, args.top)
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.budget_ms is not None:
+        if report["total_ms"] > args.budget_ms:
+            print(f"\nБюджет превышен: {report['total_ms']} мс > {args.budget_ms} мс")
+            return 1
+        print(f"\nВ пределах бюджета: {report['total_ms']} мс <= {args.budget_ms} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
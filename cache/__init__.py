@@ -0,0 +1,13 @@
+# Кэши приложения
+from .memory import AsyncTTLCache
+from .backends import CacheBackend, LocalBackend, RedisBackend
+from .namespaced import NamespacedCache, make_key
+from .entities import (cache_stats, categories_cache, close_caches, invalidate_on_commit, products_cache,
+                       users_cache)
+from .catalog import CATALOG_VERSION_KEY, invalidate_catalog, invalidate_stock_on_commit
+
+__all__ = [
+    'AsyncTTLCache', 'CacheBackend', 'LocalBackend', 'RedisBackend', 'NamespacedCache', 'make_key',
+    'cache_stats', 'categories_cache', 'close_caches', 'invalidate_on_commit', 'products_cache', 'users_cache',
+    'CATALOG_VERSION_KEY', 'invalidate_catalog', 'invalidate_stock_on_commit',
+]
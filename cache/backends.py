@@ -0,0 +1,211 @@
+# Хранилища кэша.
+#
+# - LocalBackend - LRU с TTL в памяти процесса (AsyncTTLCache на каждое
+#   пространство имён). Самый быстрый, но у каждого воркера uvicorn своя
+#   копия: записи дублируются, а сброс в одном воркере не виден другим.
+# - RedisBackend - общее хранилище по протоколу Redis (redis-server, Valkey,
+#   KeyDB; для тестов - fakeredis). Одна копия на все воркеры, значения
+#   кодируются кодеком (см. codecs.py). Пакет redis - необязательная зависимость.
+#
+# Ключи внутри хранилища: <prefix>:<namespace>:<key>. Пакетные операции
+# (get_many/set_many/delete_many) выполняются за один сетевой обмен.
+#
+# Поколение пространства имён (generation) растёт при каждом удалении.
+# Загрузка читает его до запроса к БД и передаёт в set_many: если за время
+# загрузки пространство имён сбросили, запись не выполняется и устаревшее
+# значение не попадает в кэш. У RedisBackend поколение общее для всех
+# воркеров (ключ <prefix>:#generation:<namespace>), у LocalBackend его нет -
+# достаточно счётчика в NamespacedCache.
+from typing import Any, Iterable
+
+from .codecs import Codec
+from .memory import AsyncTTLCache
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # Необязательная зависимость
+    aioredis = None
+
+
+class CacheBackend:
+    """Интерфейс хранилища кэша. Все операции принимают пространство имён (products, users, ...)."""
+    name = "base"
+
+    async def get_many(self, namespace: str, keys: Iterable[str]) -> dict[str, Any]:
+        """Найденные значения по ключам; отсутствующих ключей в результате нет."""
+        raise NotImplementedError
+
+    async def set_many(self, namespace: str, items: dict[str, Any], ttl: float,
+                       generation: int | None = None) -> None:
+        """Запись значений; с generation - только если поколение с тех пор не изменилось."""
+        raise NotImplementedError
+
+    async def generation(self, namespace: str) -> int | None:
+        """Общее для воркеров поколение пространства имён; None - хранилище его не ведёт."""
+        return None
+
+    async def delete_many(self, namespace: str, keys: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    async def clear(self, namespace: str) -> None:
+        """Удаляет все записи пространства имён."""
+        raise NotImplementedError
+
+    def invalidate_nowait(self, namespace: str, keys: Iterable[str] | None = None) -> bool:
+        """
+        Синхронное удаление ключей (keys=None - всего пространства имён), если
+        хранилище его поддерживает. False - нужно вызвать delete_many/clear.
+        """
+        return False
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalBackend(CacheBackend):
+    """LRU в памяти процесса. Значения хранятся как есть, без кодирования."""
+    name = "local"
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._namespaces: dict[str, AsyncTTLCache] = {}
+
+    def _cache(self, namespace: str) -> AsyncTTLCache:
+        cache = self._namespaces.get(namespace)
+        if cache is None:
+            cache = self._namespaces[namespace] = AsyncTTLCache(maxsize=self.maxsize, ttl=self.ttl)
+        return cache
+
+    async def get_many(self, namespace: str, keys: Iterable[str]) -> dict[str, Any]:
+        cache = self._cache(namespace)
+        missing = object()
+        found = {}
+        for key in keys:
+            value = cache.get(key, missing)
+            if value is not missing:
+                found[key] = value
+        return found
+
+    async def set_many(self, namespace: str, items: dict[str, Any], ttl: float,
+                       generation: int | None = None) -> None:
+        cache = self._cache(namespace)
+        for key, value in items.items():
+            cache.set(key, value, ttl)
+
+    async def delete_many(self, namespace: str, keys: Iterable[str]) -> None:
+        self.invalidate_nowait(namespace, keys)
+
+    async def clear(self, namespace: str) -> None:
+        self.invalidate_nowait(namespace)
+
+    def invalidate_nowait(self, namespace: str, keys: Iterable[str] | None = None) -> bool:
+        cache = self._cache(namespace)
+        if keys is None:
+            cache.clear()
+        else:
+            for key in keys:
+                cache.invalidate(key)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "namespaces": {name: cache.stats() for name, cache in self._namespaces.items()},
+        }
+
+
+class RedisBackend(CacheBackend):
+    """Общий для воркеров кэш в Redis. Соединения берутся из пула клиента redis.asyncio."""
+    name = "redis"
+
+    # Сколько ключей удаляется одной командой при очистке пространства имён
+    CLEAR_BATCH = 1000
+
+    # Запись, если поколение не изменилось: KEYS[1] - поколение, KEYS[2:] - записи;
+    # ARGV[1] - ожидаемое поколение, ARGV[2] - TTL в мс, ARGV[3:] - значения
+    SET_IF_GENERATION = """
+        if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+            return 0
+        end
+        for i = 2, #KEYS do
+            redis.call('SET', KEYS[i], ARGV[i + 1], 'PX', ARGV[2])
+        end
+        return 1
+    """
+
+    def __init__(self, url: str, codec: Codec, prefix: str = "app", client=None):
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError("Для CACHE_BACKEND=redis нужен пакет redis (pip install redis)")
+            client = aioredis.from_url(url)
+        # client можно передать готовый (например, fakeredis.aioredis.FakeRedis() в тестах)
+        self.client = client
+        self.codec = codec
+        self.prefix = prefix
+        self._set_if_generation = client.register_script(self.SET_IF_GENERATION)
+
+    def _generation_key(self, namespace: str) -> str:
+        # Вне шаблона <prefix>:<namespace>:*, поэтому clear() его не удаляет
+        return f"{self.prefix}:#generation:{namespace}"
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    async def get_many(self, namespace: str, keys: Iterable[str]) -> dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.client.mget([self._key(namespace, key) for key in keys])
+        return {key: self.codec.decode(value) for key, value in zip(keys, values) if value is not None}
+
+    async def generation(self, namespace: str) -> int | None:
+        return int(await self.client.get(self._generation_key(namespace)) or 0)
+
+    async def set_many(self, namespace: str, items: dict[str, Any], ttl: float,
+                       generation: int | None = None) -> None:
+        if not items:
+            return
+        if generation is not None:
+            # Проверка поколения и запись - атомарно, одним скриптом на сервере
+            await self._set_if_generation(
+                keys=[self._generation_key(namespace), *(self._key(namespace, key) for key in items)],
+                args=[generation, max(int(ttl * 1000), 1), *(self.codec.encode(v) for v in items.values())],
+            )
+            return
+        # Без MULTI: атомарность не нужна, достаточно одного сетевого обмена
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(self._key(namespace, key), self.codec.encode(value), px=max(int(ttl * 1000), 1))
+        await pipe.execute()
+
+    async def delete_many(self, namespace: str, keys: Iterable[str]) -> None:
+        keys = [self._key(namespace, key) for key in keys]
+        if not keys:
+            return
+        # Поколение растёт до удаления: загрузки, начатые раньше, уже не запишут старые значения
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incr(self._generation_key(namespace))
+        pipe.unlink(*keys)
+        await pipe.execute()
+
+    async def clear(self, namespace: str) -> None:
+        await self.client.incr(self._generation_key(namespace))
+        # SCAN не блокирует сервер, в отличие от KEYS; UNLINK освобождает память в фоне
+        batch = []
+        async for key in self.client.scan_iter(match=f"{self.prefix}:{namespace}:*", count=self.CLEAR_BATCH):
+            batch.append(key)
+            if len(batch) >= self.CLEAR_BATCH:
+                await self.client.unlink(*batch)
+                batch = []
+        if batch:
+            await self.client.unlink(*batch)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "codec": self.codec.name, "prefix": self.prefix}
+
+    async def close(self) -> None:
+        await self.client.aclose()
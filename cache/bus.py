@@ -0,0 +1,175 @@
+# Шина инвалидации: сброс локальных кэшей во всех воркерах по Postgres LISTEN/NOTIFY.
+#
+# С CACHE_BACKEND=local у каждого воркера свой кэш, и изменение, сделанное
+# одним воркером, другие не видят до истечения TTL. Поэтому запись в той же
+# транзакции отправляет NOTIFY (database/notifications.py), а каждый воркер
+# держит одно выделенное соединение asyncpg с LISTEN и по уведомлению
+# удаляет соответствующие записи. Задержка - доли секунды, на обработку
+# HTTP-запросов шина не тратит ни одного запроса к БД.
+#
+# - Соединение отдельное, не из пула: LISTEN живёт, пока жива сессия.
+#   Через pgbouncer в режиме transaction LISTEN не работает - DATABASE_URL
+#   должен вести напрямую в Postgres.
+# - Уведомления, отправленные, пока соединения не было, теряются. Поэтому при
+#   обрыве (и после переподключения) кэш воркера сбрасывается целиком.
+# - Обрыв TCP без закрытия соединения asyncpg сам не замечает: раз в
+#   KEEPALIVE_INTERVAL секунд выполняется SELECT 1 с таймаутом.
+# - Переподключение - с экспоненциальной задержкой до MAX_RECONNECT_DELAY.
+#
+# С CACHE_BACKEND=redis кэш общий, сбрасывающий воркер удаляет записи сам -
+# шина не запускается (NOTIFY по-прежнему отправляются и ничего не стоят).
+import asyncio
+import json
+
+from database.notifications import CHANNEL, origin
+from logger import logger
+from settings import settings
+from .catalog import CATALOG_ENTITIES, STOCK_ENTITY, apply_stock_change_soon, invalidate_catalog
+from .entities import NAMESPACES
+from .namespaced import make_key
+
+KEEPALIVE_INTERVAL = 30.0
+KEEPALIVE_TIMEOUT = 5.0
+MIN_RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30.0
+
+
+def evict(entity: str, ids: list | None, updated_at: str | None = None) -> None:
+    """Удаляет из кэша воркера записи изменённой сущности (ids=None - все)."""
+    if entity == STOCK_ENTITY and ids is not None and updated_at is not None:
+        apply_stock_change_soon(ids, updated_at)
+        return
+    if entity in CATALOG_ENTITIES or entity == STOCK_ENTITY:
+        invalidate_catalog()
+        return
+    cache = NAMESPACES.get(entity)
+    if cache is not None:
+        cache.invalidate_soon(None if ids is None else [make_key("item", item_id) for item_id in ids])
+
+
+def flush_all() -> None:
+    """Сбрасывает все кэши воркера (уведомления могли быть пропущены)."""
+    for cache in NAMESPACES.values():
+        cache.invalidate_soon()
+
+
+class InvalidationBus:
+    """Выделенное LISTEN-соединение воркера с переподключением."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.connected = False
+        self.received = 0
+        self.own = 0  # Свои уведомления: воркер уже сбросил кэш после коммита
+        self.invalid = 0
+        self.reconnects = 0
+        self.flushes = 0
+        self._was_connected = False
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self.received += 1
+        try:
+            message = json.loads(payload)
+            if message.get("origin") == origin():
+                self.own += 1
+                return
+            evict(message["entity"], message.get("ids"), message.get("updated_at"))
+        except (ValueError, KeyError, TypeError) as e:
+            self.invalid += 1
+            logger.warning(f"Некорректное уведомление об изменении данных: {payload[:200]}: {str(e)}")
+
+    def _flush(self, reason: str) -> None:
+        self.flushes += 1
+        flush_all()
+        logger.warning(f"Кэш воркера сброшен целиком: {reason}")
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        conn = await asyncpg.connect(self.dsn)
+        closed = asyncio.Event()
+        conn.add_termination_listener(lambda _: closed.set())
+        try:
+            await conn.add_listener(CHANNEL, self._on_notification)
+            self.connected = self._was_connected = True
+            if self.reconnects:
+                # Пока соединения не было, уведомления могли пропасть
+                self._flush("переподключение шины инвалидации")
+            logger.info(f"Шина инвалидации кэша слушает канал {CHANNEL}")
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    await conn.fetchval("SELECT 1", timeout=KEEPALIVE_TIMEOUT)
+            raise ConnectionError("соединение закрыто сервером")
+        finally:
+            self.connected = False
+            conn.terminate()
+
+    async def _run(self) -> None:
+        delay = MIN_RECONNECT_DELAY
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._was_connected:
+                    self._was_connected = False
+                    delay = MIN_RECONNECT_DELAY
+                    # Изменения, сделанные пока соединения нет, до воркера не дойдут
+                    self._flush("обрыв соединения шины инвалидации")
+                logger.error(f"Шина инвалидации кэша отключена: {str(e)}. Повтор через {delay:.1f} с")
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "received": self.received,
+            "own": self.own,
+            "invalid": self.invalid,
+            "reconnects": self.reconnects,
+            "flushes": self.flushes,
+        }
+
+
+_bus: InvalidationBus | None = None
+
+
+def start_invalidation_bus() -> None:
+    """Запускает шину при старте воркера (только для локального кэша и если не отключена)."""
+    global _bus
+    if settings.cache.backend != "local" or not settings.cache.invalidation_bus or _bus is not None:
+        return
+    from database.database import engine
+
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    _bus = InvalidationBus(dsn)
+    _bus.start()
+
+
+async def stop_invalidation_bus() -> None:
+    global _bus
+    if _bus is not None:
+        await _bus.stop()
+        _bus = None
+
+
+def bus_stats() -> dict | None:
+    return _bus.stats() if _bus is not None else None
@@ -0,0 +1,115 @@
+# Инвалидация кэша каталога (товары и категории).
+# Каталог меняется несколько раз в час, а читается на каждом запросе,
+# поэтому чтения каталога кэшируются (products_cache, categories_cache)
+# и сбрасываются после любого коммита, затронувшего Product или Category:
+# в этом воркере - сразу после коммита, в остальных - по NOTIFY, который
+# отправляется в той же транзакции (см. database/notifications.py, cache/bus.py).
+#
+# Исключение - списание остатков при заказе. Оно слишком частое для сброса
+# всего каталога (распродажа обнулила бы кэш), поэтому удаляются только
+# записи изменённых товаров, а версия каталога (ETag списка) сдвигается
+# на месте, без пересчёта по таблице. Страницы списка и фасеты доживают
+# свой TTL: остаток в них может отставать, но ETag страницы - версия,
+# с которой она собрана, поэтому клиент не получит 304 на устаревшее тело.
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.models import Category, Product, Review
+from database.notifications import notify, notify_async
+from .entities import categories_cache, products_cache
+from .namespaced import make_key
+
+# Модели, изменение которых делает кэш каталога устаревшим
+# (отзывы меняют рейтинг товаров в листинге)
+CATALOG_MODELS = (Product, Category, Review)
+# Сущности в уведомлениях, после которых сбрасывается весь каталог:
+# списки и фасеты не разложить по id товаров
+CATALOG_ENTITIES = ("products", "categories")
+# Сущность уведомления о списании остатков: ids товаров и updated_at, с которым они записаны
+STOCK_ENTITY = "product_stock"
+# Версия каталога в products_cache: [количество товаров, max(updated_at) строкой ISO, отпечаток категорий]
+CATALOG_VERSION_KEY = "version"
+
+
+def invalidate_catalog() -> None:
+    """
+    Сбрасывает кэш каталога в текущем воркере.
+    Вызывается автоматически после коммита ORM-изменений и при получении
+    уведомления от другого воркера. Запись в обход ORM (bulk UPDATE, COPY)
+    должна вызывать её явно и отправлять NOTIFY (notify_raw/notify_async).
+    """
+    products_cache.invalidate_soon()
+    categories_cache.invalidate_soon()
+
+
+def _bump_version(version: list, updated_at: str) -> list:
+    count, last_modified, categories = version
+    if last_modified is None or datetime.fromisoformat(updated_at) > datetime.fromisoformat(last_modified):
+        last_modified = updated_at
+    return [count, last_modified, categories]
+
+
+async def apply_stock_change(ids, updated_at: str) -> None:
+    """Удаляет записи товаров ids и сдвигает версию каталога до updated_at (количество товаров не меняется)."""
+    await products_cache.delete_many([make_key("item", product_id) for product_id in ids])
+    await products_cache.update(CATALOG_VERSION_KEY, lambda version: _bump_version(version, updated_at))
+
+
+def apply_stock_change_soon(ids, updated_at: str) -> None:
+    """apply_stock_change из синхронного кода (обработчики событий сессии, шина)."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Вне цикла событий (скрипты) кэш приложения не используется
+    loop.create_task(apply_stock_change(list(ids), updated_at))
+
+
+async def invalidate_stock_on_commit(session, ids, updated_at: datetime) -> None:
+    """
+    Для списания остатков в обход ORM (UPDATE ... RETURNING): после коммита
+    в этом воркере - apply_stock_change, остальные воркеры получают NOTIFY
+    из той же транзакции. Весь каталог не сбрасывается.
+    """
+    ids = list(ids)
+    session.info.setdefault("stock_changes", []).append((ids, updated_at.isoformat()))
+    await notify_async(session, STOCK_ENTITY, ids, extra={"updated_at": updated_at.isoformat()})
+
+
+def _changed_catalog_ids(session) -> dict[str, set[int]]:
+    """id изменённых в flush товаров и категорий (отзыв меняет свой товар)."""
+    changed = {"products": set(), "categories": set()}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            changed["products"].add(obj.id)
+        elif isinstance(obj, Category):
+            changed["categories"].add(obj.id)
+        elif isinstance(obj, Review) and obj.product_id is not None:
+            changed["products"].add(obj.product_id)
+    return changed
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_changes(session, flush_context):
+    """Запоминает в сессии, что в транзакции менялся каталог, и уведомляет другие воркеры."""
+    for entity, ids in _changed_catalog_ids(session).items():
+        if ids:
+            session.info["catalog_changed"] = True
+            # Уведомление уйдёт слушателям только после коммита этой транзакции
+            notify(session.connection(), entity, ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("catalog_changed", False):
+        invalidate_catalog()
+    for ids, updated_at in session.info.pop("stock_changes", []):
+        apply_stock_change_soon(ids, updated_at)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_after_rollback(session):
+    session.info.pop("catalog_changed", None)
+    session.info.pop("stock_changes", None)
@@ -0,0 +1,63 @@
+# Кодирование значений для внешнего (разделяемого между воркерами) кэша.
+#
+# Значения кэша - данные, совместимые с JSON: dict, list, str, числа, bool,
+# None (готовый JSON ответа кладётся строкой). Кортежи возвращаются списками.
+#
+# - msgpack - компактнее и быстрее, используется, если пакет установлен;
+# - orjson - если нет msgpack; при отсутствии обоих - стандартный json.
+import json
+
+try:
+    import msgpack
+except ImportError:  # Необязательная зависимость
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость
+    orjson = None
+
+
+class Codec:
+    """Преобразование значения кэша в байты и обратно."""
+    name = "json"
+
+    def encode(self, value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes):
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    name = "orjson"
+
+    def encode(self, value) -> bytes:
+        return orjson.dumps(value)
+
+    def decode(self, data: bytes):
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+
+    def encode(self, value) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes):
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS = {"json": Codec, "orjson": OrjsonCodec, "msgpack": MsgpackCodec}
+
+
+def get_codec(name: str = "auto") -> Codec:
+    """Кодек по имени; auto - msgpack, orjson или json, что доступно."""
+    if name == "auto":
+        name = "msgpack" if msgpack is not None else "orjson" if orjson is not None else "json"
+    if name not in CODECS:
+        raise ValueError(f"Неизвестный кодек кэша {name}, ожидается один из {list(CODECS)}")
+    if (name == "msgpack" and msgpack is None) or (name == "orjson" and orjson is None):
+        raise RuntimeError(f"Кодек кэша {name} недоступен: пакет {name} не установлен")
+    return CODECS[name]()
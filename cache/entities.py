@@ -0,0 +1,68 @@
+# Кэши моделей: по пространству имён на сущность поверх одного хранилища.
+#
+# Хранилище выбирается настройкой CACHE_BACKEND: local (по умолчанию) -
+# LRU в памяти воркера, redis - общий кэш для всех воркеров uvicorn
+# (CACHE_URL, CACHE_CODEC, CACHE_PREFIX). См. settings.CacheSettings.
+from typing import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.notifications import notify_async
+from settings import CacheSettings, settings
+from .backends import CacheBackend, LocalBackend, RedisBackend
+from .codecs import get_codec
+from .namespaced import NamespacedCache, make_key
+
+
+def build_backend(config: CacheSettings) -> CacheBackend:
+    """Хранилище кэша по настройкам."""
+    if config.backend == "redis":
+        return RedisBackend(config.url, get_codec(config.codec), prefix=config.prefix)
+    return LocalBackend(maxsize=config.size, ttl=config.ttl)
+
+
+backend = build_backend(settings.cache)
+
+products_cache = NamespacedCache(backend, "products", settings.cache.ttl)
+categories_cache = NamespacedCache(backend, "categories", settings.cache.ttl)
+users_cache = NamespacedCache(backend, "users", settings.cache.ttl)
+
+NAMESPACES = {cache.namespace: cache for cache in (products_cache, categories_cache, users_cache)}
+
+
+async def invalidate_on_commit(session, cache: NamespacedCache, ids: Iterable[int]) -> None:
+    """
+    Сбрасывает записи item|<id> после коммита сессии (для записи в обход ORM:
+    UPDATE ... RETURNING). В этом воркере - сразу после коммита, в остальных -
+    по NOTIFY, отправленному в той же транзакции. Удаление до коммита не
+    помогает: конкурентный запрос успел бы снова закэшировать старую строку.
+    """
+    ids = list(ids)
+    pending = session.info.setdefault("cache_invalidations", {})
+    pending.setdefault(cache.namespace, set()).update(make_key("item", item_id) for item_id in ids)
+    await notify_async(session, cache.namespace, ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for namespace, keys in session.info.pop("cache_invalidations", {}).items():
+        NAMESPACES[namespace].invalidate_soon(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_after_rollback(session):
+    session.info.pop("cache_invalidations", None)
+
+
+def cache_stats() -> dict:
+    """Счётчики кэшей моделей и состояние хранилища."""
+    return {
+        "storage": backend.stats(),
+        "namespaces": {name: cache.stats() for name, cache in NAMESPACES.items()},
+    }
+
+
+async def close_caches() -> None:
+    """Закрывает соединения с хранилищем (при остановке приложения)."""
+    await backend.close()
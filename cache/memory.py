@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class AsyncTTLCache:
+    """
+    Ограниченный по размеру асинхронный кэш в памяти процесса.
+
+    - TTL: запись живёт не дольше ttl секунд
+    - LRU: при переполнении вытесняется давно не использованная запись
+
+    Загрузка при промахе (read-through, single-flight) - в NamespacedCache:
+    загрузчик должен открывать собственную сессию БД, а не замыкать сессию
+    запроса, поэтому здесь только хранилище.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # ключ -> (момент истечения, значение); порядок = порядок использования
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение из кэша или default, если записи нет или она истекла."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Кладёт значение в кэш (на ttl секунд, по умолчанию self.ttl), вытесняя самые старые записи."""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удаляет одну запись."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Удаляет все записи."""
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Счётчики попаданий, промахов и вытеснений."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,217 @@
+# Кэш одного пространства имён (products, categories, users) поверх хранилища.
+#
+# Обработчики не работают с хранилищем напрямую, а оборачивают запросы
+# к БД read-through помощниками:
+#
+#     body = await users_cache.get_or_load(make_key("item", user_id), load_user, AsyncSessionLocal)
+#     products = await products_cache.get_many_or_load(ids, load_products)
+#
+# - single-flight: одновременные промахи по одному ключу в воркере
+#   выполняют загрузку один раз - в собственной сессии, а не в сессии
+#   одного из запросов;
+# - кэш заполняется только чтениями с основной БД: значение, прочитанное
+#   с отстающей реплики, после сброса снова попало бы в кэш на весь TTL и
+#   досталось бы всем, в том числе клиенту, который только что записал;
+# - загрузка, начатая до сброса пространства имён, не кладёт результат
+#   в кэш: поколение проверяется и в этом воркере, и в общем хранилище
+#   (см. CacheBackend.generation);
+# - ошибка хранилища (Redis недоступен) не ломает запрос: пишется
+#   предупреждение, и значение загружается из БД как при промахе.
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from logger import logger
+from .backends import CacheBackend
+
+# Ключи длиннее этого заменяются хешем (фильтры каталога могут быть длинными)
+MAX_KEY_LENGTH = 200
+
+
+def make_key(*parts) -> str:
+    """Строковый ключ из частей: make_key("page", filters, "newest", 20) -> 'page|...|newest|20'."""
+    key = "|".join(map(str, parts))
+    if len(key) > MAX_KEY_LENGTH:
+        return f"{parts[0]}|h:{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"
+    return key
+
+
+class NamespacedCache:
+    """Кэш пространства имён с пакетными операциями и read-through помощниками."""
+
+    def __init__(self, backend: CacheBackend, namespace: str, ttl: float):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        # (ключ, фабрика сессий) -> задача, которая сейчас заполняет запись
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _error(self, operation: str, e: Exception) -> None:
+        self.errors += 1
+        logger.warning(f"Кэш {self.namespace}: ошибка {operation}: {str(e)}")
+
+    async def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Найденные значения; при ошибке хранилища - пустой результат (все ключи - промахи)."""
+        keys = list(keys)
+        try:
+            found = await self.backend.get_many(self.namespace, keys)
+        except Exception as e:
+            self._error("чтения", e)
+            found = {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return (await self.get_many([key])).get(key, default)
+
+    async def set_many(self, items: dict[str, Any], ttl: float | None = None) -> None:
+        try:
+            await self.backend.set_many(self.namespace, items, self.ttl if ttl is None else ttl)
+        except Exception as e:
+            self._error("записи", e)
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        await self.set_many({key: value}, ttl)
+
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        self._generation += 1
+        try:
+            await self.backend.delete_many(self.namespace, keys)
+        except Exception as e:
+            self._error("удаления", e)
+
+    async def clear(self) -> None:
+        """Сбрасывает всё пространство имён."""
+        self._generation += 1
+        try:
+            await self.backend.clear(self.namespace)
+        except Exception as e:
+            self._error("очистки", e)
+
+    async def update(self, key: str, change: Callable[[Any], Any]) -> None:
+        """
+        Заменяет значение по ключу на change(value), если оно есть в кэше
+        (без обращения к БД). Сброс пространства имён во время замены
+        отменяет запись, как и у загрузок.
+        """
+        generations = await self._generations()
+        try:
+            found = await self.backend.get_many(self.namespace, [key])
+        except Exception as e:
+            self._error("чтения", e)
+            return
+        if key in found:
+            await self._store({key: change(found[key])}, generations)
+
+    def invalidate_soon(self, keys: Iterable[str] | None = None) -> None:
+        """
+        Удаление ключей (keys=None - всего пространства имён) из синхронного кода
+        (обработчики событий сессии). Поколение увеличивается сразу; если хранилище
+        не умеет удалять синхронно, удаление выполняется задачей в цикле событий.
+        """
+        self._generation += 1
+        if keys is not None:
+            keys = list(keys)
+        if self.backend.invalidate_nowait(self.namespace, keys):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Вне цикла событий (скрипты) кэш приложения не используется
+        loop.create_task(self.clear() if keys is None else self.delete_many(keys))
+
+    async def _generations(self) -> tuple[int, int | None] | None:
+        """Поколения (воркера, хранилища) перед загрузкой; None - хранилище недоступно, не записывать."""
+        local = self._generation
+        try:
+            return local, await self.backend.generation(self.namespace)
+        except Exception as e:
+            self._error("чтения поколения", e)
+            return None
+
+    async def _store(self, items: dict[str, Any], generations: tuple[int, int | None] | None) -> None:
+        """Записывает загруженные значения, если с начала загрузки пространство имён не сбрасывали."""
+        if not items or generations is None or generations[0] != self._generation:
+            return
+        try:
+            await self.backend.set_many(self.namespace, items, self.ttl, generation=generations[1])
+        except Exception as e:
+            self._error("записи", e)
+
+    async def get_or_load(
+            self,
+            key: str,
+            loader: Callable[[Any], Awaitable[Any]],
+            session_factory: Callable[[], Any],
+    ) -> Any:
+        """
+        Значение по ключу; при промахе - loader(session), результат кладётся в кэш
+        (None не кэшируется - «не найдено» проверяется заново при каждом запросе).
+
+        session_factory - фабрика сессий основной БД (AsyncSessionLocal), а не
+        реплики: общий кэш не должен заполняться данными, которые отстают
+        от уже закоммиченной записи.
+
+        Одновременные промахи по одному ключу разделяют одну загрузку. Загрузка
+        открывает собственную сессию session_factory(), а не берёт сессию
+        запроса: общая задача переживает отмену или завершение любого из
+        ожидающих запросов.
+        """
+        missing = object()
+        value = await self.get(key, missing)
+        if value is not missing:
+            return value
+
+        flight = (key, session_factory)
+        task = self._inflight.get(flight)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(flight, loader, session_factory))
+            self._inflight[flight] = task
+        # shield: отмена одного из ожидающих запросов не отменяет общую загрузку
+        return await asyncio.shield(task)
+
+    async def _fill(self, flight: tuple, loader: Callable[[Any], Awaitable[Any]],
+                    session_factory: Callable[[], Any]) -> Any:
+        try:
+            generations = await self._generations()
+            async with session_factory() as session:
+                value = await loader(session)
+            if value is not None:
+                await self._store({flight[0]: value}, generations)
+            return value
+        finally:
+            self._inflight.pop(flight, None)
+
+    async def get_many_or_load(
+            self,
+            ids: Iterable[Hashable],
+            loader: Callable[[list], Awaitable[dict[Hashable, Any]]],
+            prefix: str = "item",
+    ) -> dict[Hashable, Any]:
+        """
+        Пакетный read-through: значения по id одним чтением кэша, отсутствующие -
+        одним вызовом loader(missing_ids) -> {id: значение} и одной записью.
+        id, которых loader не вернул, в результате и в кэше отсутствуют.
+        loader должен читать основную БД (см. get_or_load).
+        """
+        ids = list(dict.fromkeys(ids))
+        keys = {item_id: make_key(prefix, item_id) for item_id in ids}
+        found = await self.get_many(keys.values())
+        result = {item_id: found[key] for item_id, key in keys.items() if key in found}
+
+        missing = [item_id for item_id in ids if item_id not in result]
+        if missing:
+            generations = await self._generations()
+            loaded = await loader(missing)
+            await self._store({keys[item_id]: value for item_id, value in loaded.items() if item_id in keys},
+                              generations)
+            result.update(loaded)
+        return result
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors, "ttl": self.ttl}
@@ -0,0 +1,292 @@
+# Потоковый массовый импорт товаров и категорий.
+#
+# Файл (CSV или NDJSON) читается по мере поступления и обрабатывается
+# пачками по CHUNK_SIZE строк:
+# 1. каждая строка валидируется схемой ProductCreate/CategoryCreate;
+# 2. валидные строки загружаются во временную таблицу бинарным COPY
+#    (asyncpg copy_records_to_table) - на порядки быстрее db.add() на строку;
+# 3. при повторе slug внутри пачки остаётся последняя строка; строки,
+#    нарушающие ссылочные и уникальные ограничения, удаляются из временной
+#    таблицы и попадают в отчёт об ошибках;
+# 4. остальные переносятся в основную таблицу одним
+#    INSERT ... ON CONFLICT (slug) DO UPDATE.
+# В памяти одновременно находится только одна пачка, поэтому потребление
+# памяти не зависит от размера файла. Весь импорт - одна транзакция.
+#
+# Запуск из командной строки:
+#     python -m database.bulk_import products feed.csv
+#     python -m database.bulk_import categories categories.ndjson
+import asyncio
+import codecs
+import csv
+import json
+import sys
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from schemas.bulk import ImportReport, ImportRowError
+from schemas.category import CategoryCreate
+from schemas.product import ProductCreate
+from .notifications import notify_raw
+
+# Количество строк в одной пачке COPY
+CHUNK_SIZE = 5000
+
+# Сколько ошибок по строкам возвращать в отчёте (остальные только считаются)
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ("csv", "ndjson")
+
+
+class ImportFormatError(ValueError):
+    """Файл не удаётся разобрать как CSV/NDJSON."""
+
+
+# Описание импортируемых сущностей:
+# - schema: схема валидации строки
+# - table: целевая таблица (уникальный ключ - slug)
+# - columns: колонки, загружаемые из файла
+# - checks: (условие над строкой t временной таблицы, текст ошибки) -
+#   такие строки не попадают в таблицу и описываются в отчёте.
+#   {tmp} в условии - имя временной таблицы; slug в ней к этому моменту уникален
+# - insert_extra: значения колонок, которые в модели заполняются на стороне
+#   Python (default=...), а при прямом INSERT их нужно задать явно
+IMPORT_TARGETS = {
+    "products": {
+        "schema": ProductCreate,
+        "table": "products",
+        "columns": ["name", "slug", "description", "price", "discount_price", "stock", "category_id"],
+        "checks": [
+            ("NOT EXISTS (SELECT 1 FROM categories c WHERE c.id = t.category_id)",
+             "Категория с таким category_id не найдена"),
+        ],
+        "insert_extra": {
+            "is_active": "true",
+            "created_at": "timezone('utc', now())",
+            "updated_at": "timezone('utc', now())",
+        },
+        "update_extra": {
+            "updated_at": "timezone('utc', now())",
+        },
+    },
+    "categories": {
+        "schema": CategoryCreate,
+        "table": "categories",
+        "columns": ["name", "slug", "description"],
+        "checks": [
+            ("EXISTS (SELECT 1 FROM categories c WHERE c.name = t.name AND c.slug <> t.slug)",
+             "Категория с таким названием уже существует под другим slug"),
+            # Название уникально: из строк пачки с одним названием и разными
+            # slug вставляется первая, остальные описываются в отчёте
+            ("EXISTS (SELECT 1 FROM {tmp} o WHERE o.name = t.name AND o.line < t.line)",
+             "Категория с таким названием уже есть выше в файле под другим slug"),
+        ],
+        "insert_extra": {},
+        "update_extra": {},
+    },
+}
+
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Разбивает поток байтов на строки (UTF-8, с сохранением перевода строки)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in stream:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line + "\n"
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Потоково разбирает файл и отдаёт (номер строки, запись, ошибка разбора).
+    Пустые значения CSV превращаются в None.
+    """
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Неизвестный формат: {fmt}")
+
+    line_no = 0
+    if fmt == "ndjson":
+        async for line in _iter_lines(stream):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"Некорректный JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Строка должна быть JSON-объектом"
+                continue
+            yield line_no, record, None
+        return
+
+    # CSV: запись может занимать несколько физических строк (перевод строки
+    # внутри кавычек). Запись закончена, когда число кавычек в ней чётно -
+    # экранированные кавычки в CSV удваиваются и чётность не меняют
+    header = None
+    buffer, start, quotes = [], 0, 0
+    async for line in _iter_lines(stream):
+        line_no += 1
+        if not buffer:
+            start = line_no
+        buffer.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        text, buffer, quotes = "".join(buffer), [], 0
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Ожидалось {len(header)} полей, получено {len(values)}"
+            continue
+        yield start, {k: (v if v != "" else None) for k, v in zip(header, values)}, None
+    if buffer:
+        yield start, None, "Незакрытые кавычки в конце файла"
+
+
+def _format_validation_error(error: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}"
+        for err in error.errors()
+    ]
+
+
+class _Importer:
+    """Загрузка одной сущности в рамках одной транзакции asyncpg."""
+
+    def __init__(self, conn, target: str):
+        self.conn = conn
+        self.spec = IMPORT_TARGETS[target]
+        self.tmp_table = f"_import_{self.spec['table']}"
+        self.report = ImportReport()
+
+    def add_error(self, line: int, errors: list[str]) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < MAX_REPORTED_ERRORS:
+            self.report.errors.append(ImportRowError(line=line, errors=errors))
+        else:
+            self.report.errors_truncated = True
+
+    async def prepare(self) -> None:
+        columns = ", ".join(self.spec["columns"])
+        # Временная таблица с теми же типами колонок, что и целевая
+        await self.conn.execute(
+            f"CREATE TEMP TABLE {self.tmp_table} ON COMMIT DROP AS "
+            f"SELECT 0 AS line, {columns} FROM {self.spec['table']} WITH NO DATA"
+        )
+
+    async def flush(self, records: list[tuple]) -> None:
+        if not records:
+            return
+        spec = self.spec
+        await self.conn.copy_records_to_table(
+            self.tmp_table, records=records, columns=["line", *spec["columns"]]
+        )
+
+        # При повторе slug внутри пачки побеждает последняя строка
+        # (ON CONFLICT не может обновить одну строку дважды за запрос).
+        # Лишние строки убираются до проверок, чтобы проверялись именно
+        # те строки, которые попадут в таблицу
+        await self.conn.execute(
+            f"DELETE FROM {self.tmp_table} t USING {self.tmp_table} n "
+            f"WHERE n.slug = t.slug AND n.line > t.line"
+        )
+
+        for condition, message in spec["checks"]:
+            rejected = await self.conn.fetch(
+                f"DELETE FROM {self.tmp_table} t WHERE {condition.format(tmp=self.tmp_table)} RETURNING line"
+            )
+            for row in sorted(rejected, key=lambda r: r["line"]):
+                self.add_error(row["line"], [message])
+
+        columns = spec["columns"]
+        insert_columns = [*columns, *spec["insert_extra"]]
+        select_values = [*columns, *spec["insert_extra"].values()]
+        updates = [f"{c} = EXCLUDED.{c}" for c in columns if c != "slug"]
+        updates += [f"{c} = {v}" for c, v in spec["update_extra"].items()]
+        # xmax = 0 у вставленных строк и не 0 у обновлённых
+        row = await self.conn.fetchrow(
+            f"WITH upserted AS ("
+            f"  INSERT INTO {spec['table']} ({', '.join(insert_columns)})"
+            f"  SELECT {', '.join(select_values)} FROM {self.tmp_table}"
+            f"  ON CONFLICT (slug) DO UPDATE SET {', '.join(updates)}"
+            f"  RETURNING (xmax = 0) AS inserted"
+            f") SELECT count(*) FILTER (WHERE inserted) AS inserted,"
+            f"         count(*) FILTER (WHERE NOT inserted) AS updated FROM upserted"
+        )
+        self.report.inserted += row["inserted"]
+        self.report.updated += row["updated"]
+        await self.conn.execute(f"TRUNCATE {self.tmp_table}")
+
+    async def run(self, stream: AsyncIterator[bytes], fmt: str) -> ImportReport:
+        await self.prepare()
+        schema, columns = self.spec["schema"], self.spec["columns"]
+        records = []
+        async for line, record, parse_error in iter_records(stream, fmt):
+            self.report.total += 1
+            if parse_error:
+                self.add_error(line, [parse_error])
+                continue
+            try:
+                data = schema.model_validate(record).model_dump()
+            except ValidationError as e:
+                self.add_error(line, _format_validation_error(e))
+                continue
+            records.append((line, *(data.get(c) for c in columns)))
+            if len(records) >= CHUNK_SIZE:
+                await self.flush(records)
+                records = []
+        await self.flush(records)
+        return self.report
+
+
+async def bulk_import(engine, target: str, stream: AsyncIterator[bytes], fmt: str) -> ImportReport:
+    """
+    Импортирует поток CSV/NDJSON в таблицу target ("products" или "categories").
+    Выполняется на отдельном соединении в одной транзакции: при сбое
+    (например, обрыве загрузки) в базе не остаётся половины файла.
+    """
+    if target not in IMPORT_TARGETS:
+        raise ImportFormatError(f"Неизвестная сущность для импорта: {target}")
+    async with engine.connect() as sa_conn:
+        raw = await sa_conn.get_raw_connection()
+        conn = raw.driver_connection  # asyncpg.Connection - нужен для COPY
+        async with conn.transaction():
+            report = await _Importer(conn, target).run(stream, fmt)
+            if report.inserted or report.updated:
+                # Кэши всех воркеров приложения сбрасываются после коммита импорта
+                await notify_raw(conn, target)
+            return report
+
+
+async def _read_file(path: str, chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+async def _main(target: str, path: str) -> None:
+    from database.database import engine
+
+    fmt = "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+    report = await bulk_import(engine, target, _read_file(path), fmt)
+    await engine.dispose()
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in IMPORT_TARGETS:
+        print("Использование: python -m database.bulk_import {products|categories} <файл.csv|файл.ndjson>")
+        sys.exit(2)
+    asyncio.run(_main(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,49 @@
+# Общие операции изменения записей одним запросом.
+#
+# Вместо «SELECT -> setattr -> commit -> refresh» (три-четыре обращения к БД)
+# обновление выполняется одним UPDATE ... RETURNING: изменённая строка
+# возвращается тем же запросом, а пустой RETURNING означает, что записи нет.
+# Коммит делает get_db после обработчика.
+from sqlalchemy import Integer, any_, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def update_returning(db: AsyncSession, model, obj_id: int, values: dict):
+    """
+    Обновляет запись model с id = obj_id и возвращает её (или None, если её нет).
+    values - только переданные клиентом поля (model_dump(exclude_unset=True)).
+    """
+    if not values:
+        # Менять нечего - просто возвращаем текущее состояние
+        result = await db.execute(select(model).where(model.id == obj_id))
+        return result.scalar()
+
+    result = await db.execute(
+        update(model)
+        .where(model.id == obj_id)
+        .values(**values)
+        .returning(model)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar()
+
+
+async def update_many_returning(db: AsyncSession, model, ids: list[int], values: dict) -> list:
+    """
+    Применяет одни и те же изменения к записям с заданными id одним запросом
+    UPDATE ... WHERE id = ANY(:ids) RETURNING и возвращает обновлённые записи.
+    """
+    id_filter = model.id == any_(literal(list(ids), ARRAY(Integer)))
+    if not values:
+        result = await db.execute(select(model).where(id_filter).order_by(model.id))
+        return list(result.scalars().all())
+
+    result = await db.execute(
+        update(model)
+        .where(id_filter)
+        .values(**values)
+        .returning(model)
+        .execution_options(synchronize_session=False)
+    )
+    return sorted(result.scalars().all(), key=lambda obj: obj.id)
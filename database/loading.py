@@ -0,0 +1,57 @@
+# Стратегии загрузки связей для схем ответа.
+# Под AsyncSession ленивая загрузка связи при сериализации либо падает
+# (MissingGreenlet), либо выполняет по запросу на каждую строку (N+1).
+# Поэтому каждая вложенная схема объявляет в eager_load, какие связи ей нужны,
+# а роутер строит по этому описанию опции selectinload/joinedload.
+import typing
+
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+# Поддерживаемые стратегии:
+# - "joined": LEFT JOIN в том же запросе - для связей многие-к-одному (product.category)
+# - "selectin": один дополнительный запрос WHERE id IN (...) - для коллекций
+LOADERS = {
+    "joined": joinedload,
+    "selectin": selectinload,
+}
+
+
+def _nested_schema(schema, field_name: str):
+    """Возвращает схему элементов поля (для list[X] - X), если это pydantic-модель."""
+    field = schema.model_fields.get(field_name)
+    if field is None:
+        return None
+    annotation = field.annotation
+    for arg in typing.get_args(annotation) or (annotation,):
+        if isinstance(arg, type) and hasattr(arg, "model_fields"):
+            return arg
+    return None
+
+
+def _loaders(model, schema) -> list:
+    """Рекурсивно строит загрузчики для связей, объявленных в схеме."""
+    options = []
+    for name, strategy in getattr(schema, "eager_load", {}).items():
+        attr = getattr(model, name)
+        loader = LOADERS[strategy](attr)
+        nested = _nested_schema(schema, name)
+        if nested is not None:
+            nested_options = _loaders(attr.property.mapper.class_, nested)
+            if nested_options:
+                loader = loader.options(*nested_options)
+        options.append(loader)
+    return options
+
+
+def eager_options(model, schema) -> list:
+    """
+    Опции загрузки для запроса select(model), результат которого
+    сериализуется схемой schema.
+
+    Все связи, не объявленные в схеме, помечаются raiseload: случайное
+    обращение к ним приводит к явной ошибке, а не к скрытому N+1.
+
+    Пример:
+        select(Product).options(*eager_options(Product, ProductWithCategory))
+    """
+    return [*_loaders(model, schema), raiseload("*")]
@@ -38,7 +38,8 @@ class OrderItem(Base):
     price = Column(Numeric(10, 2), comment="Цена на момент заказа (фиксируется)")
 
     # Внешние ключи
-    order_id = Column(Integer, ForeignKey('orders.id'), comment="ID заказа")
+    # Индекс нужен для подгрузки позиций заказа (selectin по order_id)
+    order_id = Column(Integer, ForeignKey('orders.id'), index=True, comment="ID заказа")
     product_id = Column(Integer, ForeignKey('products.id'), comment="ID товара")
 
     # Связи
@@ -1,9 +1,25 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Numeric, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import (Column, Integer, String, Text, Numeric, Boolean, DateTime, ForeignKey, Index, Computed,
+                        cast, func, literal_column)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import column_property, deferred, relationship
 from .base_model import Base
 
 
+def _rating_average(rating_sum, rating_count):
+    """
+    Выражение средней оценки. Используется и в column_property, и в индексе,
+    поэтому константы - литералы: с bind-параметрами Postgres не сопоставит
+    выражение запроса с выражением индекса.
+    """
+    zero = literal_column("0")
+    return func.round(
+        func.coalesce(cast(rating_sum, Numeric) / func.nullif(rating_count, zero), zero),
+        literal_column("2"),
+        type_=Numeric
+    )
+
+
 class Product(Base):
     """
     Товар в магазине.
@@ -22,6 +38,41 @@ class Product(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
                         comment="Дата последнего обновления")
 
+    # Фактическая цена продажи: со скидкой, если она задана.
+    # По ней фильтруют и сортируют каталог, поэтому под неё есть индексы ниже.
+    effective_price = column_property(func.coalesce(discount_price, price))
+
+    # Денормализованные агрегаты отзывов (поддерживаются database/ratings.py
+    # в той же транзакции, что и изменение отзыва), чтобы карточки и
+    # сортировка по рейтингу не обращались к таблице reviews
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0", comment="Количество отзывов")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0", comment="Сумма оценок")
+    # Гистограмма оценок: количество отзывов с оценкой 1..5
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0", comment="Отзывов с оценкой 1")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0", comment="Отзывов с оценкой 2")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0", comment="Отзывов с оценкой 3")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0", comment="Отзывов с оценкой 4")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0", comment="Отзывов с оценкой 5")
+
+    # Средняя оценка (0, если отзывов нет - NULL сломал бы keyset-пагинацию)
+    rating_average = column_property(_rating_average(rating_sum, rating_count))
+
+    # Поисковый вектор для полнотекстового поиска по названию и описанию.
+    # Генерируется самим Postgres; названия смешивают русский и английский,
+    # поэтому текст индексируется обеими конфигурациями. Название весит больше (A),
+    # чем описание (B). deferred - чтобы не тянуть вектор в обычные выборки.
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True
+        ),
+        comment="Поисковый вектор (генерируется БД)"
+    ))
+
     # Внешние ключи
     category_id = Column(Integer, ForeignKey('categories.id'), comment="ID категории")
 
@@ -29,5 +80,31 @@ class Product(Base):
     category = relationship("Category", back_populates="products")
     reviews = relationship("Review", back_populates="product", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Ключ keyset-пагинации каталога (новые товары первыми)
+        Index('ix_products_created_at_id', 'created_at', 'id'),
+        # Полнотекстовый поиск (/products/search)
+        Index('ix_products_search_vector', 'search_vector', postgresql_using='gin'),
+        # Фильтры и сортировки каталога. Последние колонки каждого индекса
+        # совпадают с ключом keyset-пагинации соответствующей сортировки
+        Index('ix_products_category_active_price', 'category_id', 'is_active',
+              func.coalesce(discount_price, price), 'id'),
+        Index('ix_products_category_created_at', 'category_id', 'created_at', 'id'),
+        Index('ix_products_price_id', func.coalesce(discount_price, price), 'id'),
+        Index('ix_products_name_id', 'name', 'id'),
+        Index('ix_products_rating_id', _rating_average(rating_sum, rating_count), 'id'),
+        # Товары в наличии, новые первыми (фильтр in_stock). Условие индекса -
+        # только stock > 0: тогда он подходит и без фильтра is_active, и с ним.
+        # Планировщик сопоставляет его с запросом, только если в запросе
+        # stock > 0 записано литералом (см. _state_conditions в routers/products.py)
+        Index('ix_products_in_stock_created_at', 'created_at', 'id',
+              postgresql_where=(stock > 0)),
+    )
+
+    @property
+    def rating_histogram(self) -> list[int]:
+        """Количество отзывов с оценками 1..5."""
+        return [self.rating_1, self.rating_2, self.rating_3, self.rating_4, self.rating_5]
+
     def __repr__(self):
         return f"<Product(id={self.id}, name='{self.name}', price={self.price})>"
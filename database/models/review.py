@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, CheckConstraint
 from sqlalchemy.orm import relationship
 from .base_model import Base
 
@@ -17,10 +17,16 @@ class Review(Base):
 
     # Внешние ключи
     user_id = Column(Integer, ForeignKey('users.id'), comment="ID автора отзыва")
-    product_id = Column(Integer, ForeignKey('products.id'), comment="ID товара")
+    # Индекс нужен для отзывов товара и пересчёта агрегатов рейтинга
+    product_id = Column(Integer, ForeignKey('products.id'), index=True, comment="ID товара")
 
     # Связи
     product = relationship("Product", back_populates="reviews")
 
+    __table_args__ = (
+        # Оценка попадает в гистограмму рейтинга товара (rating_1..rating_5)
+        CheckConstraint("rating BETWEEN 1 AND 5", name='valid_rating'),
+    )
+
     def __repr__(self):
         return f"<Review(id={self.id}, rating={self.rating})>"
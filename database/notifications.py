@@ -0,0 +1,55 @@
+# Уведомления об изменении данных для кэшей всех воркеров (Postgres NOTIFY).
+#
+# Запись вызывает pg_notify(CHANNEL, payload) в своей транзакции: Postgres
+# доставляет уведомление слушателям только после коммита (при откате оно
+# отбрасывается), а одинаковые уведомления одной транзакции склеивает.
+# Слушает канал каждый воркер приложения - см. cache/bus.py.
+#
+# payload - JSON {"entity": "products", "ids": [1, 2], "origin": "<host>:<pid>"}:
+# - entity - пространство имён кэша (products, categories, users);
+# - ids = null - изменилось неизвестно что (импорт, генератор данных),
+#   сбросить всю сущность;
+# - origin - процесс-отправитель: свои изменения воркер уже сбросил сам;
+# - дополнительные поля (extra) - по сущности, например updated_at
+#   у изменения остатков (см. cache/catalog.py).
+import json
+import os
+import socket
+
+from sqlalchemy import text
+
+CHANNEL = "cache_invalidation"
+# Postgres ограничивает payload 8000 байтами; длинный список id заменяется сбросом всей сущности
+MAX_PAYLOAD_BYTES = 7900
+
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+
+_HOST = socket.gethostname()
+
+
+def origin() -> str:
+    """Идентификатор текущего процесса (pid берётся каждый раз: воркеры могут быть форками)."""
+    return f"{_HOST}:{os.getpid()}"
+
+
+def make_payload(entity: str, ids=None, extra: dict | None = None) -> str:
+    ids = sorted(set(ids)) if ids is not None else None
+    payload = json.dumps({**(extra or {}), "entity": entity, "ids": ids, "origin": origin()}, separators=(",", ":"))
+    if ids is not None and len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        return make_payload(entity, extra=extra)
+    return payload
+
+
+def notify(connection, entity: str, ids=None) -> None:
+    """NOTIFY через синхронное соединение SQLAlchemy (в обработчиках событий сессии)."""
+    connection.execute(NOTIFY_SQL, {"channel": CHANNEL, "payload": make_payload(entity, ids)})
+
+
+async def notify_async(session, entity: str, ids=None, extra: dict | None = None) -> None:
+    """NOTIFY через AsyncSession или AsyncConnection."""
+    await session.execute(NOTIFY_SQL, {"channel": CHANNEL, "payload": make_payload(entity, ids, extra)})
+
+
+async def notify_raw(conn, entity: str, ids=None) -> None:
+    """NOTIFY через соединение asyncpg (COPY, скрипты)."""
+    await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, make_payload(entity, ids))
@@ -0,0 +1,114 @@
+# Keyset (курсорная) пагинация.
+# В отличие от OFFSET, который заставляет Postgres прочитать и выбросить все
+# пропущенные строки, keyset-пагинация продолжает выборку с последнего
+# увиденного ключа: WHERE (sort_key, id) > (:last_sort_key, :last_id).
+# При наличии индекса по (sort_key, id) глубокие страницы стоят столько же,
+# сколько первая.
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import Select, tuple_
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён или не соответствует ключу сортировки."""
+
+
+def _encode_value(value):
+    """Приводит значение ключа к JSON-совместимому виду."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _decode_value(value, key):
+    """Восстанавливает python-тип значения по типу колонки ключа."""
+    if value is None:
+        return None
+    try:
+        python_type = key.type.python_type
+    except NotImplementedError:
+        # Тип выражения неизвестен SQLAlchemy - оставляем значение из JSON
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Кодирует значения ключа сортировки в непрозрачный токен.
+    Клиент не должен разбирать токен - он просто передаёт его обратно в `after`.
+    """
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, keys: list) -> list:
+    """Декодирует токен, полученный из encode_cursor, для заданного ключа."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise InvalidCursorError("Курсор не соответствует сортировке")
+        return [_decode_value(v, k) for v, k in zip(values, keys)]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError,
+            TypeError, ValueError, InvalidOperation) as e:
+        if isinstance(e, InvalidCursorError):
+            raise
+        raise InvalidCursorError("Некорректный курсор") from e
+
+
+def cursor_for(row, keys: list) -> str:
+    """Строит курсор по ключевым атрибутам ORM-объекта (последней строки страницы)."""
+    return encode_cursor([getattr(row, key.key) for key in keys])
+
+
+def apply_keyset(
+        stmt: Select,
+        keys: list,
+        after: str | None,
+        limit: int,
+        descending: bool = False,
+) -> Select:
+    """
+    Добавляет к запросу сортировку по ключу и условие продолжения после курсора.
+
+    Параметры:
+    - keys: колонки сортировки, последняя должна быть уникальной (обычно id)
+    - after: курсор из предыдущей страницы или None для первой страницы
+    - limit: размер страницы; запрашивается limit + 1 строка, чтобы
+      понять, есть ли следующая страница (см. split_page)
+    - descending: направление сортировки (одинаковое для всех колонок,
+      чтобы условие оставалось сравнением кортежей и использовало индекс)
+    """
+    if after is not None:
+        values = decode_cursor(after, keys)
+        row_key = tuple_(*keys)
+        cursor_key = tuple_(*values)
+        stmt = stmt.where(row_key < cursor_key if descending else row_key > cursor_key)
+
+    order = [key.desc() if descending else key.asc() for key in keys]
+    return stmt.order_by(*order).limit(limit + 1)
+
+
+def split_page(rows: list, keys: list, limit: int) -> tuple[list, str | None]:
+    """
+    Отрезает лишнюю (limit + 1) строку и возвращает страницу и курсор следующей.
+    Если следующей страницы нет (или страница пуста) - курсор равен None.
+    """
+    if len(rows) > limit:
+        page = rows[:limit]
+        if not page:
+            return page, None
+        return page, cursor_for(page[-1], keys)
+    return rows, None
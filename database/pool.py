@@ -0,0 +1,58 @@
+# Пул соединений с замером времени ожидания.
+#
+# Стандартный пул SQLAlchemy сообщает размер, число выданных соединений и
+# overflow, но не то, сколько запросы ждут свободного соединения - а именно
+# это показывает, что пул мал для числа воркеров и нагрузки.
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, считающий время получения соединения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def recreate(self):
+        # Статистика переживает пересоздание пула (engine.dispose)
+        pool = super().recreate()
+        pool.acquisitions, pool.timeouts = self.acquisitions, self.timeouts
+        pool.wait_total, pool.wait_max = self.wait_total, self.wait_max
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.acquisitions += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+
+    def stats(self) -> dict:
+        """Текущее состояние пула и накопленная статистика ожидания."""
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "acquisitions": self.acquisitions,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.acquisitions * 1000, 3) if self.acquisitions else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            # Для Prometheus - без округления, в секундах
+            "wait_seconds": self.wait_total,
+            "wait_max_seconds": self.wait_max,
+        }
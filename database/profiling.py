@@ -0,0 +1,182 @@
+# Профилирование SQL по HTTP-запросам.
+#
+# Включается настройкой DB_PROFILING=true. Для каждого HTTP-запроса
+# собирается число SQL-запросов, суммарное время в БД и самые медленные
+# запросы. Запросы группируются по «форме»: значения параметров и длина
+# списков в IN/VALUES заменяются на ?, поэтому один и тот же запрос
+# с разными id считается одним.
+#
+# - В ответ добавляется заголовок Server-Timing (виден во вкладке Network
+#   браузера): db;dur=<мс>;desc="<N> queries" и самые медленные запросы.
+# - Если один и тот же запрос выполнен за HTTP-запрос больше
+#   DB_N_PLUS_ONE_THRESHOLD раз, в лог пишется предупреждение: это
+#   типичная картина N+1 - связь подгружается лениво для каждой строки
+#   (например, category в ProductWithCategory без eager_load).
+#
+# Выключенное профилирование ничего не стоит: обработчики событий движка
+# и middleware просто не регистрируются. SQLAlchemy импортируется только
+# в instrument(): подключение middleware в main не тянет её за собой.
+import logging
+import re
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+
+from logger import logger
+
+# Сколько самых медленных запросов попадает в Server-Timing
+SERVER_TIMING_SLOWEST = 3
+# Длина описания запроса в Server-Timing и в логе
+STATEMENT_PREVIEW = 120
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|\?")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)  # Тексты запросов повторяются (кэш компиляции SQLAlchemy)
+def normalize(statement: str) -> str:
+    """Форма запроса: литералы и параметры -> ?, списки (?, ?, ...) -> (?...), пробелы схлопнуты."""
+    statement = _STRING.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _LIST.sub("(?...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+class QueryProfile:
+    """SQL-статистика одного HTTP-запроса."""
+    __slots__ = ("count", "total", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        # Форма запроса -> [выполнений, суммарное время, максимальное время]
+        self.statements: dict[str, list] = {}
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        key = normalize(statement)
+        stats = self.statements.get(key)
+        if stats is None:
+            self.statements[key] = [1, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            if duration > stats[2]:
+                stats[2] = duration
+
+    def slowest(self, limit: int) -> list[tuple[str, int, float, float]]:
+        """Самые медленные формы запросов по суммарному времени: (форма, выполнений, сумма, максимум)."""
+        ranked = sorted(self.statements.items(), key=lambda item: -item[1][1])[:limit]
+        return [(statement, count, total, longest) for statement, (count, total, longest) in ranked]
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Формы запросов, выполненные больше threshold раз (кандидаты в N+1)."""
+        return [(statement, stats[0]) for statement, stats in self.statements.items() if stats[0] > threshold]
+
+
+# Профиль текущего HTTP-запроса; None - запрос не профилируется
+profile_var: ContextVar[QueryProfile | None] = ContextVar("query_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if profile_var.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = profile_var.get()
+    started = conn.info.get("query_started")
+    if profile is not None and started:
+        profile.record(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    # Запрос упал - убираем его время начала, чтобы не сбить следующие замеры
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument(sync_engine) -> None:
+    """Подключает профилирование к движку (engine.sync_engine)."""
+    from sqlalchemy import event
+
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def _header_text(value: str) -> str:
+    """Строка для desc в Server-Timing: только ASCII, без кавычек и обратных слэшей."""
+    value = value.encode("ascii", "replace").decode().replace("\\", "/").replace('"', "'")
+    return value[:STATEMENT_PREVIEW]
+
+
+def server_timing(profile: QueryProfile) -> str:
+    """Значение заголовка Server-Timing для профиля."""
+    entries = [f'db;dur={profile.total * 1000:.2f};desc="{profile.count} queries"']
+    for i, (statement, count, total, _) in enumerate(profile.slowest(SERVER_TIMING_SLOWEST), start=1):
+        entries.append(f'db-{i};dur={total * 1000:.2f};desc="{count}x {_header_text(statement)}"')
+    return ", ".join(entries)
+
+
+class SQLProfilingMiddleware:
+    """
+    ASGI middleware: профиль SQL на каждый HTTP-запрос, заголовок Server-Timing
+    и предупреждение о повторяющихся запросах (N+1).
+    """
+
+    def __init__(self, app, n_plus_one_threshold: int):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = profile_var.set(profile)
+
+        async def send_wrapper(message):
+            # К началу ответа обработчик уже выполнил свои запросы
+            # (у потоковых ответов - только те, что были до первого байта)
+            if message["type"] == "http.response.start" and profile.count:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(profile).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile_var.reset(token)
+            self._report(scope, profile)
+
+    def _report(self, scope, profile: QueryProfile) -> None:
+        route = getattr(scope.get("route"), "path", scope.get("path"))
+        for statement, count in profile.repeated(self.n_plus_one_threshold):
+            logger.warning(
+                f"Возможный N+1: {scope['method']} {route} выполнил один и тот же запрос {count} раз: "
+                f"{statement[:STATEMENT_PREVIEW]}",
+                extra={"route": route, "sql_repeats": count, "sql": statement},
+            )
+        if profile.count and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"SQL {scope['method']} {route}: {profile.count} запросов, {profile.total * 1000:.1f} мс",
+                extra={
+                    "route": route,
+                    "sql_queries": profile.count,
+                    "sql_ms": round(profile.total * 1000, 2),
+                    "sql_slowest": [
+                        {"sql": s[:STATEMENT_PREVIEW], "count": c, "total_ms": round(t * 1000, 2),
+                         "max_ms": round(m * 1000, 2)}
+                        for s, c, t, m in profile.slowest(SERVER_TIMING_SLOWEST)
+                    ],
+                },
+            )
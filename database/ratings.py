@@ -0,0 +1,117 @@
+# Поддержка денормализованных агрегатов отзывов в таблице products.
+#
+# Любое изменение Review через ORM (создание, смена оценки или товара,
+# удаление) после flush превращается в атомарный
+#     UPDATE products SET rating_count = rating_count + :n, rating_sum = rating_sum + :s, ...
+# в той же транзакции. Счётчики меняются относительным приращением, поэтому
+# одновременные отзывы на один товар не теряют обновлений.
+from collections import defaultdict
+
+from sqlalchemy import event, inspect, text, update
+from sqlalchemy.orm import Session
+
+from .models.product import Product
+from .models.review import Review
+
+RATING_HISTOGRAM_COLUMNS = {
+    1: "rating_1",
+    2: "rating_2",
+    3: "rating_3",
+    4: "rating_4",
+    5: "rating_5",
+}
+
+
+def _old_value(obj, attr: str):
+    """Значение атрибута до изменений в текущем flush."""
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, attr)
+
+
+def _collect_rating_deltas(session) -> dict[int, dict[int, int]]:
+    """Приращения гистограммы: product_id -> {оценка: +/- количество}."""
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    for obj in session.new:
+        if isinstance(obj, Review) and obj.product_id is not None:
+            deltas[obj.product_id][obj.rating] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Review):
+            product_id = _old_value(obj, "product_id")
+            if product_id is not None:
+                deltas[product_id][_old_value(obj, "rating")] -= 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, Review):
+            continue
+        old = (_old_value(obj, "product_id"), _old_value(obj, "rating"))
+        new = (obj.product_id, obj.rating)
+        if old == new:
+            continue
+        if old[0] is not None:
+            deltas[old[0]][old[1]] -= 1
+        if new[0] is not None:
+            deltas[new[0]][new[1]] += 1
+
+    return deltas
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_product_ratings(session, flush_context):
+    """Применяет изменения отзывов к агрегатам товаров в той же транзакции."""
+    deltas = _collect_rating_deltas(session)
+    for product_id, histogram in deltas.items():
+        histogram = {rating: n for rating, n in histogram.items() if n}
+        if not histogram:
+            continue
+        values = {
+            "rating_count": Product.rating_count + sum(histogram.values()),
+            "rating_sum": Product.rating_sum + sum(rating * n for rating, n in histogram.items()),
+        }
+        for rating, n in histogram.items():
+            column = getattr(Product, RATING_HISTOGRAM_COLUMNS[rating])
+            values[RATING_HISTOGRAM_COLUMNS[rating]] = column + n
+        session.connection().execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+# Полный пересчёт агрегатов по таблице reviews: для первичного заполнения
+# и для восстановления после записи в reviews в обход ORM
+RECALCULATE_RATINGS_SQL = text("""
+    UPDATE products p SET
+        rating_count = coalesce(r.cnt, 0),
+        rating_sum = coalesce(r.total, 0),
+        rating_1 = coalesce(r.r1, 0),
+        rating_2 = coalesce(r.r2, 0),
+        rating_3 = coalesce(r.r3, 0),
+        rating_4 = coalesce(r.r4, 0),
+        rating_5 = coalesce(r.r5, 0)
+    FROM products p2
+    LEFT JOIN (
+        SELECT product_id,
+               count(*) AS cnt,
+               sum(rating) AS total,
+               count(*) FILTER (WHERE rating = 1) AS r1,
+               count(*) FILTER (WHERE rating = 2) AS r2,
+               count(*) FILTER (WHERE rating = 3) AS r3,
+               count(*) FILTER (WHERE rating = 4) AS r4,
+               count(*) FILTER (WHERE rating = 5) AS r5
+        FROM reviews
+        GROUP BY product_id
+    ) r ON r.product_id = p2.id
+    WHERE p.id = p2.id
+""")
+
+
+async def recalculate_ratings(conn) -> None:
+    """Пересчитывает агрегаты отзывов всех товаров (AsyncConnection или AsyncSession)."""
+    await conn.execute(RECALCULATE_RATINGS_SQL)
@@ -0,0 +1,105 @@
+# Маршрутизация чтений между репликой и основной БД.
+#
+# Чтение уходит на реплику, если:
+# - реплика настроена и отвечает;
+# - её отставание не больше replica_max_lag (проверяется не чаще, чем раз
+#   в replica_check_interval секунд, результат общий для всех запросов воркера).
+#   Проверка идёт в фоне и ограничена тем же интервалом: запросы её не ждут,
+#   а берут последний известный результат - зависшая реплика не задерживает
+#   чтения, они просто уходят на основную БД;
+# - клиент недавно ничего не записывал. После успешного запроса на запись
+#   ответ получает cookie STICKY_COOKIE, и в течение sticky_seconds чтения
+#   этого клиента идут на основную БД - он сразу видит свои изменения
+#   (read-your-writes), даже если реплика ещё не догнала.
+# Общий кэш (NamespacedCache.get_or_load) заполняется только с основной БД:
+# иначе значение с отстающей реплики попало бы в кэш и досталось бы всем,
+# в том числе прилипшему клиенту.
+import asyncio
+import time
+
+from fastapi import Request, Response
+from sqlalchemy import text
+
+from logger import logger
+
+STICKY_COOKIE = "db_primary_until"
+
+# Методы, после которых клиент «прилипает» к основной БД
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Отставание реплики в секундах (0 для основной БД и для реплики без активности)
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaMonitor:
+    """Кэшированная проверка доступности и отставания реплики."""
+
+    def __init__(self, engine, max_lag: float, check_interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: float | None = None
+        self.healthy = False
+        self._checked_at = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def _probe(self) -> float:
+        async with self.engine.connect() as conn:
+            return float((await conn.execute(REPLICA_LAG_SQL)).scalar())
+
+    async def _check(self) -> None:
+        try:
+            # Таймауты движка (connect, command_timeout) рассчитаны на обычные
+            # запросы; проверка не должна длиться дольше своего интервала
+            self.lag = await asyncio.wait_for(self._probe(), self.check_interval)
+            healthy = self.lag <= self.max_lag
+            if not healthy and self.healthy:
+                logger.warning(f"Реплика отстаёт на {self.lag:.1f} с, чтения переключены на основную БД")
+        except Exception as e:
+            if self.healthy:
+                reason = f"нет ответа за {self.check_interval:g} с" if isinstance(e, asyncio.TimeoutError) else str(e)
+                logger.error(f"Реплика недоступна, чтения переключены на основную БД: {reason}")
+            self.lag, healthy = None, False
+        self.healthy = healthy
+        self._checked_at = time.monotonic()
+
+    async def is_usable(self) -> bool:
+        """
+        True, если реплика доступна и отстаёт не больше допустимого - по
+        последней проверке. Устаревший результат обновляется в фоне (не больше
+        одной проверки одновременно); до её окончания действует прежний.
+        """
+        if time.monotonic() - self._checked_at >= self.check_interval and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._check())
+        return self.healthy
+
+    def stats(self) -> dict:
+        return {"healthy": self.healthy, "lag_seconds": self.lag, "max_lag_seconds": self.max_lag}
+
+
+def is_sticky(request: Request) -> bool:
+    """Клиент недавно выполнял запись и должен читать с основной БД."""
+    value = request.cookies.get(STICKY_COOKIE)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+def mark_sticky(response: Response, seconds: float) -> None:
+    """Привязывает клиента к основной БД на seconds секунд после записи."""
+    response.set_cookie(
+        STICKY_COOKIE,
+        str(time.time() + seconds),
+        max_age=max(int(seconds), 1),
+        httponly=True,
+        samesite="lax"
+    )
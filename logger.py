@@ -1,34 +1,166 @@
+# Логирование приложения.
+#
+# Обработчики запросов не пишут в stderr сами: logger.info/error только
+# кладут запись в ограниченную очередь (QueueHandler), а в поток вывода её
+# пишет отдельный поток QueueListener. Поэтому медленный stderr (pipe,
+# сборщик логов контейнера) не блокирует цикл событий.
+#
+# - Формат - JSON-строка на запись (LOG_FORMAT=json, по умолчанию) или
+#   цветной текст для локальной отладки (LOG_FORMAT=console).
+# - Каждая запись содержит request_id текущего запроса (см. request_id_var
+#   и middleware в main.py).
+# - Очередь ограничена (LOG_QUEUE_SIZE). Если поток вывода не успевает,
+#   новые записи отбрасываются и считаются в dropped - логирование никогда
+#   не притормаживает обработку запросов.
+# - Сэмплирование по уровням (LOG_SAMPLING="DEBUG=0.01,INFO=0.1"): доля
+#   записей уровня, которая попадёт в лог. Отброшенные считаются в sampled_out.
+#   WARNING и выше по умолчанию не сэмплируются.
+import atexit
+import json
 import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
 import colorlog
 
-# Настройка цветовой схемы
-log_colors = {
-    'DEBUG': 'cyan',
-    'INFO': 'green',
-    'WARNING': 'yellow',
-    'ERROR': 'red',
-    'CRITICAL': 'bold_red',
-}
-
-# Конфигурация формата и цветов
-formatter = colorlog.ColoredFormatter(
-    '%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    log_colors=log_colors,
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
-# Создание обработчика (вывод в консоль)
-handler = logging.StreamHandler()
-handler.setFormatter(formatter)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# ID текущего запроса (выставляется middleware, читается при записи в лог)
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Стандартные атрибуты LogRecord - всё остальное пришло через extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "request_id", "asctime"}
+
+
+def parse_sampling(value: str) -> dict[int, float]:
+    """'DEBUG=0.01,INFO=0.1' -> {logging.DEBUG: 0.01, logging.INFO: 0.1}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        level, _, rate = item.partition("=")
+        rates[logging.getLevelName(level.strip().upper())] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, сообщение, request_id и поля из extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler, который никогда не ждёт: при полной очереди запись
+    отбрасывается. Сэмплирование выполняется до постановки в очередь.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sampling: dict[int, float] | None = None):
+        super().__init__(log_queue)
+        self.sampling = sampling or {}
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        rate = self.sampling.get(record.levelno)
+        if rate is not None and rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return
+        super().emit(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Всё, что зависит от контекста вызова (request_id, аргументы сообщения,
+        # трассировка исключения), фиксируем здесь - форматирование JSON
+        # и запись выполняются уже в потоке QueueListener
+        record = logging.makeLogRecord(vars(record))
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+def _make_formatter() -> logging.Formatter:
+    if LOG_FORMAT == "console":
+        return colorlog.ColoredFormatter(
+            '%(log_color)s%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
+            log_colors={
+                'DEBUG': 'cyan',
+                'INFO': 'green',
+                'WARNING': 'yellow',
+                'ERROR': 'red',
+                'CRITICAL': 'bold_red',
+            },
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    return JsonFormatter()
+
+
+# Обработчик вывода работает в потоке QueueListener
+_stream_handler = logging.StreamHandler(sys.stderr)
+_stream_handler.setFormatter(_make_formatter())
+
+_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = BoundedQueueHandler(_queue, parse_sampling(os.getenv("LOG_SAMPLING", "")))
+_listener = QueueListener(_queue, _stream_handler, respect_handler_level=True)
+_listener.start()
 
 # Настройка логгера
-logger = colorlog.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(handler)
-
-# Пример использования
-logger.debug("Это DEBUG (голубой)")
-logger.info("Это INFO (зелёный)")
-logger.warning("Это WARNING (жёлтый)")
-logger.error("Это ERROR (красный)")
-logger.critical("Это CRITICAL (жирный красный)")
+logger = logging.getLogger("app")
+logger.setLevel(LOG_LEVEL)
+logger.addHandler(queue_handler)
+logger.propagate = False
+
+
+def log_stats() -> dict:
+    """Состояние очереди логов: ожидают записи, отброшено при переполнении и сэмплированием."""
+    return {
+        "queued": _queue.qsize(),
+        "queue_size": LOG_QUEUE_SIZE,
+        "dropped": queue_handler.dropped,
+        "sampled_out": queue_handler.sampled_out,
+    }
+
+
+def shutdown() -> None:
+    """Дописывает оставшиеся в очереди записи и останавливает поток вывода."""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            # Нет места даже для сигнала остановки - поток вывода завершится вместе с процессом
+            pass
+        _listener = None
+
+
+atexit.register(shutdown)
@@ -1,6 +1,14 @@
-from fastapi import FastAPI
+import asyncio
+import importlib
+import time
+import uuid
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from logger import logger
+from fastapi.responses import PlainTextResponse
+from logger import logger, request_id_var
+from settings import settings
+import metrics
 
 app = FastAPI(
     title="Магазин электроники API",
@@ -15,28 +23,143 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Курсор следующей страницы, валидатор кэша, ID запроса для поиска в логах
+    expose_headers=["X-Next-Cursor", "ETag", "X-Request-ID", "Server-Timing"],
 )
 
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """
+    После успешной записи клиент на несколько секунд привязывается к основной
+    БД, чтобы следующие чтения не ушли на отстающую реплику.
+    """
+    response = await call_next(request)
+    from database.database import read_engine
+    from database.routing import WRITE_METHODS, mark_sticky
+    if read_engine is not None and request.method in WRITE_METHODS and response.status_code < 400:
+        mark_sticky(response, settings.database.sticky_seconds)
+    return response
+
+
+@app.middleware("http")
+async def request_id(request: Request, call_next):
+    """
+    ID запроса: берётся из заголовка X-Request-ID (если его выставил балансировщик)
+    или генерируется. Попадает в каждую запись лога и возвращается в ответе.
+    """
+    value = request.headers.get("x-request-id", "")[:64] or uuid.uuid4().hex
+    token = request_id_var.set(value)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = value
+    return response
+
+
+# Профилирование SQL (Server-Timing, предупреждения о N+1) - только если включено,
+# иначе middleware не добавляется вовсе
+if settings.database.profiling:
+    from database.profiling import SQLProfilingMiddleware
+    app.add_middleware(SQLProfilingMiddleware, n_plus_one_threshold=settings.database.n_plus_one_threshold)
+
+# Метрики (время ответа, статусы, SQL-запросы на запрос) - внешний слой,
+# чтобы время ответа включало все остальные middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+# Роутеры: (модуль, префикс, теги). Модули импортируются при старте
+# воркера, а не при импорте main: сам main (и всё, что его импортирует -
+# скрипты, бенчмарки) не платит за SQLAlchemy, модели и схемы
+ROUTERS = [
+    ("routers.users", "/users", ["Пользователи"]),
+    ("routers.products", "", None),
+    ("routers.orders", "", None),
+    ("routers.catalog_import", "", None),
+]
+
+
+def include_routers(application: FastAPI) -> dict[str, float]:
+    """
+    Импортирует и подключает роутеры из ROUTERS (один раз).
+    Возвращает время подключения каждого роутера, мс.
+    """
+    timings = {}
+    if getattr(application.state, "routers_included", False):
+        return timings
+    for module_name, prefix, tags in ROUTERS:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        kwargs = {"tags": tags} if tags else {}
+        application.include_router(module.router, prefix=prefix, **kwargs)
+        timings[module_name] = round((time.perf_counter() - started) * 1000, 1)
+    application.state.routers_included = True
+    return timings
+
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up...")
-    # Инициализация БД
-    from database.database import init_db
-    await init_db()
-    logger.info("Database initialized")
+    timings = include_routers(app)
+    if timings:
+        logger.info(f"Роутеры подключены за {sum(timings.values()):.1f} мс: {timings}")
+    # Схема БД создаётся миграциями (alembic upgrade head), здесь только проверка версии
+    from database.database import check_schema
+    await check_schema()
+    logger.info("Database schema is up to date")
+    # Сброс локального кэша по изменениям из других воркеров (см. cache/bus.py)
+    from cache.bus import start_invalidation_bus
+    start_invalidation_bus()
+    if metrics.METRICS_DIR is not None:
+        # Снимки метрик для агрегации между воркерами (см. metrics.py)
+        app.state.metrics_flush = asyncio.create_task(metrics.flush_periodically())
+
+
+@app.get("/cache/stats", tags=["Служебное"])
+async def cache_stats():
+    """Счётчики кэшей моделей (попадания, промахи, ошибки), состояние хранилища и шины инвалидации."""
+    from cache import cache_stats as collect_cache_stats
+    from cache.bus import bus_stats
+    return {**collect_cache_stats(), "invalidation_bus": bus_stats()}
+
+
+@app.get("/db/pool", tags=["Служебное"])
+async def db_pool_stats():
+    """Состояние пула соединений с БД текущего воркера."""
+    from database.database import pool_stats
+    return pool_stats()
+
+
+@app.get("/logs/stats", tags=["Служебное"])
+async def logs_stats():
+    """Очередь логов текущего воркера: ожидают записи, отброшено, отсэмплировано."""
+    from logger import log_stats
+    return log_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Метрики в текстовом формате Prometheus (суммарно по воркерам, если задан METRICS_DIR)."""
+    own = metrics.metrics.snapshot()
+    snapshots = await asyncio.to_thread(metrics.collect_snapshots, own)
+    return PlainTextResponse(metrics.render(snapshots), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down...")
+    flush = getattr(app.state, "metrics_flush", None)
+    if flush is not None:
+        flush.cancel()
+    from cache.bus import stop_invalidation_bus
+    await stop_invalidation_bus()
+    from cache import close_caches
+    await close_caches()
+    import security
+    security.shutdown()
 
 
-# Подключаем роутеры
-from routers import users
-
-app.include_router(users.router, prefix="/users", tags=["Пользователи"])
-
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,304 @@
+# Метрики для Prometheus.
+#
+# Что собирается (на воркер):
+# - http_requests_total{method, route, status} - число ответов;
+# - http_request_duration_seconds{method, route} - гистограмма времени ответа;
+# - http_requests_in_flight - запросы, обрабатываемые прямо сейчас;
+# - db_queries_per_request{method, route} - гистограмма числа SQL-запросов
+#   на HTTP-запрос (рост - признак N+1);
+# - db_pool_* - состояние пулов соединений (database.database.pool_stats).
+#
+# route - шаблон пути (/users/{user_id}), а не сам путь: число рядов метрик
+# не растёт от id в URL. Запросы, не попавшие ни в один маршрут, идут под <unmatched>.
+#
+# Накладные расходы минимальны: корзины гистограмм фиксированы заранее,
+# наблюдение - это bisect и несколько инкрементов в словарях. Воркер работает
+# в одном потоке цикла событий, и между инкрементами нет await, поэтому
+# блокировки не нужны.
+#
+# Несколько воркеров (uvicorn --workers N): если задан METRICS_DIR, каждый
+# воркер раз в METRICS_FLUSH_INTERVAL секунд сохраняет снимок своих метрик
+# в METRICS_DIR/<pid>.json, а /metrics (на любом воркере) суммирует снимки.
+# Счётчики завершившихся воркеров продолжают учитываться, их gauge - нет.
+# Каталог нужно очищать при перезапуске приложения.
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from logger import logger
+
+# Границы корзин, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин, число SQL-запросов
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Счётчики текущего HTTP-запроса (заполняются событиями SQLAlchemy)."""
+    __slots__ = ("queries",)
+
+    def __init__(self):
+        self.queries = 0
+
+
+# Статистика текущего запроса; None вне HTTP-запросов (скрипты, фоновые задачи)
+request_stats_var: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Обработчик before_cursor_execute: +1 запрос к счётчику текущего HTTP-запроса."""
+    stats = request_stats_var.get()
+    if stats is not None:
+        stats.queries += 1
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (хранятся не накопленные счётчики)."""
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    """Метрики HTTP одного воркера."""
+
+    def __init__(self):
+        self.requests: dict[tuple[str, str, str], int] = {}
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.queries: dict[tuple[str, str], Histogram] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, duration: float, queries: int) -> None:
+        key = (method, route)
+        status_key = (method, route, str(status))
+        self.requests[status_key] = self.requests.get(status_key, 0) + 1
+
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(duration)
+
+        histogram = self.queries.get(key)
+        if histogram is None:
+            histogram = self.queries[key] = Histogram(QUERY_BUCKETS)
+        histogram.observe(queries)
+
+    def snapshot(self) -> dict:
+        """Снимок метрик воркера в JSON-совместимом виде."""
+        from database.database import pool_stats
+
+        return {
+            "pid": os.getpid(),
+            "requests": [[list(key), value] for key, value in self.requests.items()],
+            "latency": [[list(key), list(h.counts), h.sum] for key, h in self.latency.items()],
+            "queries": [[list(key), list(h.counts), h.sum] for key, h in self.queries.items()],
+            "in_flight": self.in_flight,
+            "pool": pool_stats(),
+        }
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: время ответа, статус, число SQL-запросов и запросы в обработке.
+    Чистый ASGI (без BaseHTTPMiddleware) - не создаёт лишних задач на запрос.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Если приложение упало до начала ответа
+        stats = RequestStats()
+        token = request_stats_var.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            metrics.in_flight -= 1
+            request_stats_var.reset(token)
+            # Маршрут становится известен после роутинга (FastAPI кладёт его в scope)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            metrics.observe(scope["method"], route_path, status, duration, stats.queries)
+
+
+# --- Несколько воркеров ---
+
+def _snapshot_path(pid: int) -> Path:
+    return Path(METRICS_DIR) / f"{pid}.json"
+
+
+def write_snapshot(snapshot: dict) -> None:
+    """Атомарно сохраняет снимок воркера в METRICS_DIR."""
+    path = _snapshot_path(snapshot["pid"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot))
+    os.replace(tmp, path)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect_snapshots(own: dict) -> list[dict]:
+    """
+    Снимки всех воркеров: own - свежий снимок текущего, остальные - из METRICS_DIR.
+    Работает с файлами, поэтому вызывается в потоке (asyncio.to_thread).
+    """
+    if METRICS_DIR is None:
+        return [own]
+    write_snapshot(own)
+    snapshots = []
+    for path in Path(METRICS_DIR).glob("*.json"):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # Файл удалён или пишется прямо сейчас
+        snapshot["alive"] = snapshot["pid"] == own["pid"] or _is_alive(snapshot["pid"])
+        snapshots.append(snapshot)
+    return snapshots
+
+
+async def flush_periodically() -> None:
+    """Фоновая задача воркера: раз в METRICS_FLUSH_INTERVAL сохраняет снимок в METRICS_DIR."""
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            # Снимок берётся в цикле событий (согласованный), запись файла - в потоке
+            await asyncio.to_thread(write_snapshot, metrics.snapshot())
+        except Exception as e:
+            logger.error(f"Не удалось сохранить снимок метрик: {str(e)}")
+
+
+# --- Формат Prometheus ---
+
+def _labels(names: tuple, values) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _sum_counters(snapshots: list[dict], field: str) -> dict[tuple, float]:
+    totals = {}
+    for snapshot in snapshots:
+        for key, value in snapshot[field]:
+            totals[tuple(key)] = totals.get(tuple(key), 0) + value
+    return totals
+
+
+def _sum_histograms(snapshots: list[dict], field: str) -> dict[tuple, tuple[list, float]]:
+    totals = {}
+    for snapshot in snapshots:
+        for key, counts, total in snapshot[field]:
+            key = tuple(key)
+            if key in totals:
+                acc_counts, acc_sum = totals[key]
+                totals[key] = ([a + b for a, b in zip(acc_counts, counts)], acc_sum + total)
+            else:
+                totals[key] = (list(counts), total)
+    return totals
+
+
+def _render_histogram(lines: list, name: str, help_text: str, buckets: tuple, data: dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    names = ("method", "route")
+    for key, (counts, total) in sorted(data.items()):
+        cumulative = 0
+        for bound, count in zip((*buckets, "+Inf"), counts):
+            cumulative += count
+            labels = _labels((*names, "le"), (*key, bound))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        lines.append(f"{name}_sum{_labels(names, key)} {total}")
+        lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+
+
+# Поля pool_stats: (имя метрики, тип, описание, сведение по воркерам)
+POOL_METRICS = {
+    "size": ("db_pool_size", "gauge", "Постоянных соединений в пуле", sum),
+    "checked_out": ("db_pool_checked_out", "gauge", "Соединений выдано", sum),
+    "checked_in": ("db_pool_checked_in", "gauge", "Свободных соединений в пуле", sum),
+    "overflow": ("db_pool_overflow", "gauge", "Соединений сверх pool_size", sum),
+    "acquisitions": ("db_pool_acquisitions_total", "counter", "Получений соединения из пула", sum),
+    "timeouts": ("db_pool_timeouts_total", "counter", "Таймаутов ожидания соединения", sum),
+    # Среднее ожидание - rate(wait_seconds_total) / rate(acquisitions_total)
+    "wait_seconds": ("db_pool_wait_seconds_total", "counter", "Суммарное ожидание соединения, секунды", sum),
+    "wait_max_seconds": ("db_pool_wait_max_seconds", "gauge",
+                         "Самое долгое ожидание соединения с запуска воркера, секунды", max),
+}
+
+
+def render(snapshots: list[dict]) -> str:
+    """Текстовый формат Prometheus (version 0.0.4) по снимкам воркеров."""
+    lines = [
+        "# HELP http_requests_total Число HTTP-ответов",
+        "# TYPE http_requests_total counter",
+    ]
+    for key, value in sorted(_sum_counters(snapshots, "requests").items()):
+        lines.append(f"http_requests_total{_labels(('method', 'route', 'status'), key)} {value}")
+
+    _render_histogram(lines, "http_request_duration_seconds", "Время ответа, секунды",
+                      LATENCY_BUCKETS, _sum_histograms(snapshots, "latency"))
+    _render_histogram(lines, "db_queries_per_request", "SQL-запросов на HTTP-запрос",
+                      QUERY_BUCKETS, _sum_histograms(snapshots, "queries"))
+
+    alive = [s for s in snapshots if s.get("alive", True)]
+    lines.append("# HELP http_requests_in_flight HTTP-запросов в обработке")
+    lines.append("# TYPE http_requests_in_flight gauge")
+    lines.append(f"http_requests_in_flight {sum(s['in_flight'] for s in alive)}")
+    lines.append("# HELP app_workers Воркеров, приславших метрики")
+    lines.append("# TYPE app_workers gauge")
+    lines.append(f"app_workers {len(alive)}")
+
+    for field, (name, kind, help_text, aggregate) in POOL_METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        # Gauge - только живые воркеры, счётчики - все
+        source = alive if kind == "gauge" else snapshots
+        for pool in ("primary", "replica"):
+            # Снимки воркеров старой версии могут не содержать новых полей
+            values = [s["pool"][pool][field] for s in source if field in (s["pool"].get(pool) or {})]
+            if values:
+                lines.append(f"{name}{_labels(('pool',), (pool,))} {aggregate(values)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,113 @@
+"""Исходная схема (таблицы, которые создавал init_db)
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-17
+
+БД, созданную старым init_db, не нужно пересоздавать: достаточно
+отметить её этой ревизией (alembic stamp 0001_initial) и выполнить
+alembic upgrade head.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001_initial'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('categories',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False, comment='Название категории'),
+    sa.Column('slug', sa.String(length=100), nullable=False, comment="URL-идентификатор (например, 'electronics')"),
+    sa.Column('description', sa.Text(), nullable=True, comment='Описание категории для SEO'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name'),
+    sa.UniqueConstraint('slug')
+    )
+    op.create_index(op.f('ix_categories_id'), 'categories', ['id'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('firstname', sa.String(length=50), nullable=False),
+    sa.Column('last_name', sa.String(length=50), nullable=False),
+    sa.Column('birthday', sa.Date(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('hashed_password', sa.String(length=255), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.Date(), nullable=True),
+    sa.Column('uuid', sa.UUID(), nullable=True),
+    sa.CheckConstraint("email ~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,}$'", name='email_format'),
+    sa.CheckConstraint('birthday <= CURRENT_DATE', name='valid_birthday'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('email', name='uq_email'),
+    sa.UniqueConstraint('username'),
+    sa.UniqueConstraint('username', name='uq_username'),
+    sa.UniqueConstraint('uuid')
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True, comment='Статус: created/paid/shipped/delivered/cancelled'),
+    sa.Column('total_amount', sa.Numeric(precision=12, scale=2), nullable=True, comment='Итоговая сумма заказа'),
+    sa.Column('created_at', sa.DateTime(), nullable=True, comment='Дата создания заказа'),
+    sa.Column('address', sa.Text(), nullable=True, comment='Адрес доставки'),
+    sa.Column('phone', sa.String(length=20), nullable=True, comment='Контактный телефон'),
+    sa.Column('user_id', sa.Integer(), nullable=True, comment='ID покупателя'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_orders_id'), 'orders', ['id'], unique=False)
+    op.create_table('products',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False, comment='Название товара'),
+    sa.Column('slug', sa.String(length=200), nullable=False, comment="ЧПУ (например, 'iphone-15-pro')"),
+    sa.Column('description', sa.Text(), nullable=True, comment='Полное описание с HTML-разметкой'),
+    sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=False, comment='Цена (макс. 99999999.99)'),
+    sa.Column('discount_price', sa.Numeric(precision=10, scale=2), nullable=True, comment='Цена со скидкой, если есть'),
+    sa.Column('stock', sa.Integer(), nullable=True, comment='Остаток на складе'),
+    sa.Column('is_active', sa.Boolean(), nullable=True, comment='Активен ли товар для продажи'),
+    sa.Column('created_at', sa.DateTime(), nullable=True, comment='Дата создания записи'),
+    sa.Column('updated_at', sa.DateTime(), nullable=True, comment='Дата последнего обновления'),
+    sa.Column('category_id', sa.Integer(), nullable=True, comment='ID категории'),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('slug')
+    )
+    op.create_index(op.f('ix_products_id'), 'products', ['id'], unique=False)
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=True, comment='Количество товара'),
+    sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=True, comment='Цена на момент заказа (фиксируется)'),
+    sa.Column('order_id', sa.Integer(), nullable=True, comment='ID заказа'),
+    sa.Column('product_id', sa.Integer(), nullable=True, comment='ID товара'),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_items_id'), 'order_items', ['id'], unique=False)
+    op.create_table('reviews',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('rating', sa.Integer(), nullable=False, comment='Оценка (1-5 звезд)'),
+    sa.Column('text', sa.Text(), nullable=True, comment='Текст отзыва'),
+    sa.Column('created_at', sa.DateTime(), nullable=True, comment='Дата создания'),
+    sa.Column('user_id', sa.Integer(), nullable=True, comment='ID автора отзыва'),
+    sa.Column('product_id', sa.Integer(), nullable=True, comment='ID товара'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reviews_id'), 'reviews', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('reviews')
+    op.drop_table('order_items')
+    op.drop_table('products')
+    op.drop_table('orders')
+    op.drop_table('users')
+    op.drop_table('categories')
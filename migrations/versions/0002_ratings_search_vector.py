@@ -0,0 +1,100 @@
+"""Агрегаты рейтинга, поисковый вектор и проверка оценки отзыва
+
+Revision ID: 0002_ratings_search_vector
+Revises: 0001_initial
+Create Date: 2026-10-17
+
+- products: денормализованные агрегаты отзывов (rating_*) с первичным
+  заполнением из reviews, генерируемый search_vector;
+- проверка оценки отзыва 1..5 (NOT VALID: существующие строки проверяет
+  следующая миграция, вне этой транзакции).
+
+Блокировки: миграция выполняется в одной транзакции и держит ACCESS
+EXCLUSIVE на products и reviews до коммита. ADD COLUMN с server_default
+без перезаписи таблицы быстрый, но заполнение агрегатов (UPDATE по
+товарам с отзывами) и добавление хранимого search_vector (перезапись
+products) на большом каталоге занимают время, пока чтение и запись
+products заблокированы - выполняйте её в окно обслуживания.
+Индексы строятся без блокировки записи в 0003_concurrent_indexes.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0002_ratings_search_vector'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+RATING_COLUMNS = [
+    ('rating_count', 'Количество отзывов'),
+    ('rating_sum', 'Сумма оценок'),
+    ('rating_1', 'Отзывов с оценкой 1'),
+    ('rating_2', 'Отзывов с оценкой 2'),
+    ('rating_3', 'Отзывов с оценкой 3'),
+    ('rating_4', 'Отзывов с оценкой 4'),
+    ('rating_5', 'Отзывов с оценкой 5'),
+]
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+# Копия database.ratings.RECALCULATE_RATINGS_SQL: миграция не должна
+# зависеть от кода приложения, который со временем меняется
+BACKFILL_RATINGS_SQL = """
+    UPDATE products p SET
+        rating_count = r.cnt,
+        rating_sum = r.total,
+        rating_1 = r.r1,
+        rating_2 = r.r2,
+        rating_3 = r.r3,
+        rating_4 = r.r4,
+        rating_5 = r.r5
+    FROM (
+        SELECT product_id,
+               count(*) AS cnt,
+               sum(rating) AS total,
+               count(*) FILTER (WHERE rating = 1) AS r1,
+               count(*) FILTER (WHERE rating = 2) AS r2,
+               count(*) FILTER (WHERE rating = 3) AS r3,
+               count(*) FILTER (WHERE rating = 4) AS r4,
+               count(*) FILTER (WHERE rating = 5) AS r5
+        FROM reviews
+        WHERE product_id IS NOT NULL
+        GROUP BY product_id
+    ) r
+    WHERE p.id = r.product_id
+"""
+
+
+def upgrade() -> None:
+    # NOT VALID: ограничение сразу действует для новых строк, а проверка
+    # существующих (VALIDATE) - в 0003 отдельной транзакцией; VALIDATE в этой
+    # же транзакции держал бы ACCESS EXCLUSIVE на reviews до её конца
+    op.create_check_constraint('valid_rating', 'reviews', 'rating BETWEEN 1 AND 5', postgresql_not_valid=True)
+
+    for name, comment in RATING_COLUMNS:
+        op.add_column('products', sa.Column(name, sa.Integer(), server_default='0', nullable=False, comment=comment))
+    # Агрегаты товаров, у которых уже есть отзывы (у остальных - server_default 0)
+    op.execute(BACKFILL_RATINGS_SQL)
+
+    op.add_column('products', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+        nullable=True,
+        comment='Поисковый вектор (генерируется БД)'
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'search_vector')
+    for name, _ in reversed(RATING_COLUMNS):
+        op.drop_column('products', name)
+
+    op.drop_constraint('valid_rating', 'reviews', type_='check')
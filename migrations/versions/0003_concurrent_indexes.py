@@ -0,0 +1,65 @@
+"""Индексы горячих запросов (CREATE INDEX CONCURRENTLY) и проверка valid_rating
+
+Revision ID: 0003_concurrent_indexes
+Revises: 0002_ratings_search_vector
+Create Date: 2026-10-17
+
+- индексы каталога: keyset-пагинация, фильтры и сортировки, полнотекстовый
+  поиск, товары в наличии (частичный индекс);
+- индексы внешних ключей, по которым подгружаются позиции заказа и отзывы;
+- проверка существующих строк reviews ограничением valid_rating.
+
+Блокировки: всё выполняется вне транзакции миграции (autocommit_block).
+CREATE INDEX CONCURRENTLY и VALIDATE CONSTRAINT берут SHARE UPDATE
+EXCLUSIVE - чтение и запись products, reviews и order_items продолжаются
+всё время сборки. Индексы создаются с IF NOT EXISTS, поэтому миграцию
+можно повторить после сбоя. Если сборка прервалась, Postgres оставляет
+индекс INVALID - удалите его (DROP INDEX CONCURRENTLY <имя>) и выполните
+upgrade повторно.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003_concurrent_indexes'
+down_revision = '0002_ratings_search_vector'
+branch_labels = None
+depends_on = None
+
+# Выражения должны текстуально совпадать с выражениями запросов
+# (Product.effective_price и Product.rating_average), иначе Postgres
+# не использует индекс
+EFFECTIVE_PRICE_SQL = 'coalesce(discount_price, price)'
+RATING_AVERAGE_SQL = 'round(coalesce(CAST(rating_sum AS NUMERIC) / CAST(nullif(rating_count, 0) AS NUMERIC), 0), 2)'
+
+# (имя, таблица, колонки, дополнительные параметры create_index)
+INDEXES = [
+    ('ix_products_created_at_id', 'products', ['created_at', 'id'], {}),
+    ('ix_products_search_vector', 'products', ['search_vector'], {'postgresql_using': 'gin'}),
+    ('ix_products_category_active_price', 'products',
+     ['category_id', 'is_active', sa.literal_column(EFFECTIVE_PRICE_SQL), 'id'], {}),
+    ('ix_products_category_created_at', 'products', ['category_id', 'created_at', 'id'], {}),
+    ('ix_products_price_id', 'products', [sa.literal_column(EFFECTIVE_PRICE_SQL), 'id'], {}),
+    ('ix_products_name_id', 'products', ['name', 'id'], {}),
+    ('ix_products_rating_id', 'products', [sa.literal_column(RATING_AVERAGE_SQL), 'id'], {}),
+    ('ix_products_in_stock_created_at', 'products', ['created_at', 'id'],
+     {'postgresql_where': sa.text('stock > 0')}),
+    ('ix_order_items_order_id', 'order_items', ['order_id'], {}),
+    ('ix_reviews_product_id', 'reviews', ['product_id'], {}),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY нельзя выполнять внутри транзакции: autocommit_block
+    # фиксирует транзакцию миграции, и каждая команда ниже идёт отдельно
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True, **options)
+        op.execute('ALTER TABLE reviews VALIDATE CONSTRAINT valid_rating')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
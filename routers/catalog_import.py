@@ -0,0 +1,51 @@
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from cache import invalidate_catalog
+from database.bulk_import import ImportFormatError, bulk_import
+from database.database import engine
+from schemas.bulk import ImportReport
+from logger import logger
+
+router = APIRouter(prefix="/import", tags=["Импорт"])
+
+
+@router.post("/{target}", response_model=ImportReport)
+async def import_catalog(
+        target: Literal["products", "categories"],
+        request: Request,
+        format: Literal["csv", "ndjson"] = "csv",
+):
+    """
+    Массовый импорт товаров или категорий из CSV/NDJSON.
+
+    Тело запроса передаётся как есть (не multipart) и читается потоково,
+    поэтому размер файла не ограничен памятью сервера. Записи с уже
+    существующим slug обновляются. Для CSV первая строка - заголовок
+    с именами полей ProductCreate/CategoryCreate.
+
+    Возвращает отчёт: сколько строк создано, обновлено и отклонено,
+    с описанием ошибок по номерам строк.
+    """
+    try:
+        report = await bulk_import(engine, target, request.stream(), format)
+    except ImportFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при импорте {target}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при импорте"
+        )
+
+    # Импорт идёт в обход ORM, поэтому кэш каталога этого воркера сбрасываем явно
+    # (остальные воркеры получают NOTIFY, отправленный в транзакции импорта)
+    invalidate_catalog()
+    logger.info(
+        f"Импорт {target}: создано {report.inserted}, обновлено {report.updated}, ошибок {report.failed}"
+    )
+    return report
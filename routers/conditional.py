@@ -0,0 +1,63 @@
+# Условные GET-запросы (ETag / Last-Modified).
+# Клиент присылает валидаторы из прошлого ответа в If-None-Match /
+# If-Modified-Since; если данные не менялись, отвечаем 304 без тела -
+# без загрузки строк и без сериализации Pydantic.
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из частей версии (например, количество строк и max(updated_at))."""
+    version = "-".join(
+        str(int(p.replace(tzinfo=timezone.utc).timestamp() * 1_000_000)) if isinstance(p, datetime) else str(p)
+        for p in parts
+    )
+    return f'W/"{version}"'
+
+
+def _http_date(value: datetime) -> str:
+    # В БД время хранится в UTC без часового пояса (datetime.utcnow)
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: datetime | None) -> dict:
+    """Заголовки валидаторов для ответа 200 или 304."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    """
+    Проверяет условные заголовки запроса (RFC 7232).
+    If-None-Match имеет приоритет: If-Modified-Since учитывается, только если его нет.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Слабое сравнение: префикс W/ не учитывается
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def not_modified(etag: str, last_modified: datetime | None) -> Response:
+    """Пустой ответ 304 с теми же валидаторами."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=validator_headers(etag, last_modified)
+    )
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Integer, any_, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import invalidate_stock_on_commit
+from database.database import get_db
+from database.models.order import Order, OrderItem
+from database.models.product import Product
+from schemas.order import OrderCreate, OrderWithItems
+from logger import logger
+
+router = APIRouter(prefix="/orders", tags=["Заказы"])
+
+
+@router.post("/", response_model=OrderWithItems, status_code=status.HTTP_201_CREATED)
+async def create_order(
+        order: OrderCreate,
+        user_id: int = Query(..., gt=0, description="ID покупателя"),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Оформление заказа.
+
+    Порядок работы (одна транзакция):
+    1. Цены всех товаров загружаются одним запросом WHERE id = ANY(:ids)
+       и фиксируются в позициях заказа; итоговая сумма считается сразу
+    2. Заказ и позиции вставляются одним flush
+    3. Остатки списываются одним условным
+       UPDATE ... WHERE stock >= qty RETURNING id на все позиции.
+       Это последний запрос перед коммитом, поэтому блокировки строк товаров
+       держатся минимально; если хотя бы одной позиции не хватает,
+       транзакция откатывается целиком и перепродажи не происходит
+    4. После коммита из кэша удаляются изменённые товары и сдвигается версия
+       каталога (в остальных воркерах - по NOTIFY); списки и фасеты не сбрасываются
+    """
+    # Одинаковые товары в заказе объединяем в одну позицию
+    quantities = defaultdict(int)
+    for item in order.items:
+        quantities[item.product_id] += item.quantity
+    product_ids = sorted(quantities)
+
+    try:
+        result = await db.execute(
+            select(Product.id, Product.effective_price.label("price"))
+            .where(Product.id == any_(literal(product_ids, ARRAY(Integer))))
+            .where(Product.is_active == True)
+        )
+        prices = {row.id: row.price for row in result}
+        missing = [product_id for product_id in product_ids if product_id not in prices]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Товары не найдены или недоступны для заказа: {missing}"
+            )
+
+        db_order = Order(
+            user_id=user_id,
+            address=order.address,
+            phone=order.phone,
+            status="created",
+            total_amount=sum((prices[pid] * qty for pid, qty in quantities.items()), Decimal("0")),
+            items=[
+                OrderItem(product_id=pid, quantity=qty, price=prices[pid])
+                for pid, qty in quantities.items()
+            ]
+        )
+        db.add(db_order)
+        await db.flush()
+
+        # Списание остатков одним запросом на весь заказ. Позиции передаются
+        # двумя типизированными массивами, поэтому текст запроса не зависит
+        # от их количества и переиспользуется кэшем подготовленных запросов.
+        # CTE locked блокирует строки в порядке id: два заказа с одинаковыми
+        # товарами ждут друг друга, а не попадают во взаимную блокировку
+        locked = (
+            select(Product.id)
+            .where(Product.id == any_(literal(product_ids, ARRAY(Integer))))
+            .order_by(Product.id)
+            .with_for_update()
+            .cte("locked")
+        )
+        requested = select(
+            func.unnest(literal(product_ids, ARRAY(Integer))).label("id"),
+            func.unnest(literal([quantities[pid] for pid in product_ids], ARRAY(Integer))).label("qty"),
+        ).subquery("requested")
+        updated_at = datetime.utcnow()
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == locked.c.id)
+            .where(Product.id == requested.c.id, Product.stock >= requested.c.qty)
+            # updated_at меняется явно: из него строятся ETag списка и карточки товара
+            .values(stock=Product.stock - requested.c.qty, updated_at=updated_at)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        reserved = set(result.scalars().all())
+        short = [product_id for product_id in product_ids if product_id not in reserved]
+        if short:
+            # Исключение откатывает транзакцию в get_db: заказ и списания отменяются
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Недостаточно товара на складе: {short}"
+            )
+
+        # Остатки меняются в обход ORM: после коммита во всех воркерах
+        # удаляются записи этих товаров и сдвигается версия каталога
+        await invalidate_stock_on_commit(db, reserved, updated_at)
+        await db.commit()
+        logger.info(f"Создан заказ {db_order.id} пользователя {user_id} на сумму {db_order.total_amount}")
+        return db_order
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при создании заказа: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при создании заказа"
+        )
@@ -1,51 +1,436 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Float, Integer, and_, func, literal, literal_column, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
-from database.database import get_db
+from cache import CATALOG_VERSION_KEY, make_key, products_cache
+from database.database import AsyncSessionLocal, choose_read_sessionmaker, get_read_db
+from database.loading import eager_options
+from database.models.category import Category
 from database.models.product import Product
+from database.pagination import InvalidCursorError, apply_keyset, encode_cursor, split_page
 from schemas.product import *
+from schemas.relations import ProductWithCategory
+from .conditional import is_not_modified, make_etag, not_modified, validator_headers
+from .serialization import dump_list, json_response
 from logger import logger
 
 router = APIRouter(prefix="/products", tags=["Товары"])
 
+# Сортировки каталога: ключ keyset-пагинации (id - для однозначности) и
+# направление. Под каждый ключ есть индекс в database/models/product.py
+PRODUCT_SORTS = {
+    "newest": ([Product.created_at, Product.id], True),
+    "price_asc": ([Product.effective_price, Product.id], False),
+    "price_desc": ([Product.effective_price, Product.id], True),
+    "name": ([Product.name, Product.id], False),
+    "rating": ([Product.rating_average, Product.id], True),
+}
+
+# Границы ценовых диапазонов для фасетов: [0, 1000), [1000, 5000), ..., [100000, ∞)
+PRICE_BUCKETS = [Decimal(b) for b in (0, 1000, 5000, 10000, 50000, 100000)]
+
+
+def get_product_filter(
+        category_id: int | None = Query(None, gt=0, description="ID категории"),
+        min_price: Decimal | None = Query(None, ge=0, description="Минимальная цена (с учётом скидки)"),
+        max_price: Decimal | None = Query(None, ge=0, description="Максимальная цена (с учётом скидки)"),
+        is_active: bool | None = Query(None, description="Фильтр по активности товара"),
+        in_stock: bool | None = Query(None, description="Только товары в наличии (stock > 0)"),
+) -> ProductFilter:
+    """Собирает фильтры каталога из query-параметров."""
+    return ProductFilter(
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        is_active=is_active,
+        in_stock=in_stock
+    )
+
+
+def _category_conditions(filters: ProductFilter) -> list:
+    if filters.category_id is None:
+        return []
+    return [Product.category_id == filters.category_id]
+
+
+def _price_conditions(filters: ProductFilter) -> list:
+    conditions = []
+    if filters.min_price is not None:
+        conditions.append(Product.effective_price >= filters.min_price)
+    if filters.max_price is not None:
+        conditions.append(Product.effective_price <= filters.max_price)
+    return conditions
+
+
+def _state_conditions(filters: ProductFilter) -> list:
+    # Значения подставляются литералами, а не параметрами: обобщённый план
+    # подготовленного запроса (asyncpg кэширует их) может использовать
+    # частичный индекс ix_products_in_stock_created_at, только если условие
+    # stock > 0 видно в тексте запроса
+    conditions = []
+    if filters.is_active is not None:
+        conditions.append(Product.is_active == literal(filters.is_active, literal_execute=True))
+    if filters.in_stock is not None:
+        zero = literal(0, literal_execute=True)
+        conditions.append(Product.stock > zero if filters.in_stock else Product.stock <= zero)
+    return conditions
+
+
+def product_conditions(filters: ProductFilter) -> list:
+    """Условия WHERE для всех заданных фильтров каталога."""
+    return [*_category_conditions(filters), *_price_conditions(filters), *_state_conditions(filters)]
+
+
+# Отпечаток категорий для версии каталога: у категорий нет updated_at, а их
+# поля входят в ответ списка (ProductWithCategory). Таблица маленькая -
+# агрегат по ней дешевле, чем по товарам
+CATEGORIES_DIGEST = (
+    select(func.md5(func.coalesce(func.string_agg(
+        func.concat_ws("|", Category.id, Category.name, Category.slug, Category.description),
+        aggregate_order_by(literal(","), Category.id)
+    ), "")))
+    .scalar_subquery()
+)
+
+
+async def get_catalog_version() -> list:
+    """
+    Версия каталога: [количество товаров, max(updated_at) строкой ISO,
+    отпечаток категорий]. Из неё строятся ETag/Last-Modified списка (см. catalog_validators);
+    значение кэшируется вместе с каталогом и сбрасывается при его изменении,
+    а при списании остатков сдвигается на месте (см. cache/catalog.py).
+    Как и всё, что кладётся в кэш, читается с основной БД.
+    """
+    async def load_version(db: AsyncSession):
+        result = await db.execute(select(func.count(Product.id), func.max(Product.updated_at), CATEGORIES_DIGEST))
+        count, last_modified, categories = result.one()
+        # Значения кэша должны кодироваться msgpack/JSON: дата - строкой ISO
+        return [count, last_modified.isoformat() if last_modified else None, categories]
+
+    return await products_cache.get_or_load(CATALOG_VERSION_KEY, load_version, AsyncSessionLocal)
+
+
+def catalog_validators(version: list) -> tuple[str, datetime | None]:
+    """
+    ETag и Last-Modified списка по версии каталога. Last-Modified - только по
+    товарам: переименование категории меняет ETag, а If-None-Match
+    проверяется раньше If-Modified-Since.
+    """
+    count, last_modified, categories = version
+    last_modified = datetime.fromisoformat(last_modified) if last_modified else None
+    return make_etag(count, last_modified, categories), last_modified
+
 
 @router.get("/products", response_model=list[ProductWithCategory])
 async def get_products(
-        skip: int = 0,
-        limit: int = 10,
-        db: AsyncSession = Depends(get_db)
+        request: Request,
+        filters: ProductFilter = Depends(get_product_filter),
+        sort: Literal["newest", "price_asc", "price_desc", "name", "rating"] = "newest",
+        skip: int = Query(0, ge=0, description="Сколько товаров пропустить (без курсора)"),
+        limit: int = Query(10, ge=1, le=100, description="Размер страницы"),
+        after: str | None = None
 ):
     """
         Получить список товаров для главной страницы.
 
         Параметры:
-        - skip: количество товаров для пропуска (пагинация)
+        - category_id, min_price, max_price, is_active, in_stock: фильтры
+          (цена учитывает скидку, если она задана)
+        - sort: newest (по умолчанию), price_asc, price_desc, name, rating.
+          Курсор действителен только для той сортировки, с которой получен
+        - skip: количество товаров для пропуска (пагинация, устаревший режим)
         - limit: максимальное количество товаров для возврата (макс. 100)
+        - after: курсор из заголовка X-Next-Cursor предыдущей страницы.
+          Если передан, skip игнорируется, а глубокие страницы
+          загружаются так же быстро, как первая
 
         Возвращает:
         - Список товаров с информацией о категориях
+        - Заголовок X-Next-Cursor с курсором следующей страницы (если она есть)
+        - Заголовки ETag/Last-Modified; на If-None-Match/If-Modified-Since
+          с актуальной версией отвечает 304 без загрузки товаров
         """
-    try:
-        # Получаем товары из БД с пагинацией
-        result = await db.execute(
+    if after is not None:
+        skip = 0
+    sort_key, descending = PRODUCT_SORTS[sort]
+    version = None
+
+    async def load_page(db: AsyncSession):
+        # Получаем товары из БД с keyset-пагинацией; категории подгружаются
+        # тем же запросом (JOIN), а не отдельным запросом на каждый товар
+        stmt = apply_keyset(
             select(Product)
-            .offset(skip)
-            .limit(min(limit, 100))  # Ограничиваем максимум 100 товаров
+            .where(*product_conditions(filters))
+            .options(*eager_options(Product, ProductWithCategory)),
+            sort_key, after, limit, descending=descending
         )
-        products = result.scalars().all()
+        if skip:
+            stmt = stmt.offset(skip)
+        result = await db.execute(stmt)
+        page, cursor = split_page(result.scalars().all(), sort_key, limit)
+        # В кэш кладём готовый JSON (строкой), а не ORM-объекты сессии: при
+        # попадании в кэш страница отдаётся без валидации и сериализации.
+        # Вместе с ней - версия каталога, прочитанная до загрузки страницы
+        return [dump_list(ProductWithCategory, page).decode() if page else None, cursor, version]
+
+    try:
+        version = await get_catalog_version()
+        etag, last_modified = catalog_validators(version)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
 
-        if not products:
+        body, next_cursor, page_version = await products_cache.get_or_load(
+            make_key("page", sorted(filters.model_dump(mode="json").items()), sort, skip, limit, after), load_page,
+            AsyncSessionLocal
+        )
+
+        if body is None:
             raise HTTPException(
                 status_code=404,
                 detail="Товары не найдены"
             )
 
-        return products
+        # Списание остатков сдвигает версию, не сбрасывая страницы: страница,
+        # собранная раньше, отдаётся со своей версией. Клиенту, у которого
+        # она уже есть, - 304; после обновления страницы он получит её целиком
+        if page_version != version:
+            etag, last_modified = catalog_validators(page_version)
+            if is_not_modified(request, etag, last_modified):
+                return not_modified(etag, last_modified)
+        headers = validator_headers(etag, last_modified)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return json_response(body, headers)
 
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при получении товаров: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail="Внутренняя ошибка сервера"
         )
+
+
+@router.get("/facets", response_model=ProductFacets)
+async def get_product_facets(
+        filters: ProductFilter = Depends(get_product_filter)
+):
+    """
+    Фасеты каталога: количество товаров по категориям и ценовым диапазонам.
+
+    Считаются одним сгруппированным запросом (GROUPING SETS). Как принято
+    в фасетной навигации, счётчики категорий учитывают все фильтры, кроме
+    самой категории, а счётчики цен - все, кроме диапазона цен, чтобы
+    пользователь видел, сколько товаров даст смена выбора.
+    """
+    # Массив границ подставляется литералом: выражение в SELECT и GROUP BY
+    # должно совпадать текстуально, а связанные параметры у них были бы разными
+    bounds = literal_column(f"ARRAY[{', '.join(str(b) for b in PRICE_BUCKETS)}]::numeric[]")
+    bucket = func.width_bucket(Product.effective_price, bounds)
+
+    async def load_facets(db: AsyncSession):
+        stmt = (
+            select(
+                func.grouping(Product.category_id, type_=Integer).label("is_price_row"),
+                Product.category_id,
+                bucket.label("bucket"),
+                func.count().filter(and_(true(), *_price_conditions(filters))).label("category_count"),
+                func.count().filter(and_(true(), *_category_conditions(filters))).label("price_count"),
+            )
+            .where(*_state_conditions(filters))
+            .group_by(func.grouping_sets(Product.category_id, bucket))
+        )
+        facets = ProductFacets()
+        for row in await db.execute(stmt):
+            if not row.is_price_row:
+                if row.category_count:
+                    facets.categories.append(CategoryFacet(category_id=row.category_id, count=row.category_count))
+            elif row.price_count and row.bucket:
+                facets.price_buckets.append(PriceBucketFacet(
+                    min_price=PRICE_BUCKETS[row.bucket - 1],
+                    max_price=PRICE_BUCKETS[row.bucket] if row.bucket < len(PRICE_BUCKETS) else None,
+                    count=row.price_count
+                ))
+        facets.price_buckets.sort(key=lambda b: b.min_price)
+        return facets.model_dump_json()
+
+    try:
+        body = await products_cache.get_or_load(
+            make_key("facets", sorted(filters.model_dump(mode="json").items())), load_facets, AsyncSessionLocal
+        )
+        return json_response(body.encode())
+    except Exception as e:
+        logger.error(f"Ошибка при подсчёте фасетов: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Внутренняя ошибка сервера"
+        )
+
+
+@router.get("/search", response_model=list[ProductWithCategory])
+async def search_products(
+        q: str = Query(..., min_length=1, max_length=200, description="Поисковый запрос"),
+        limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+        after: str | None = None,
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Полнотекстовый поиск товаров по названию и описанию.
+
+    Запрос разбирается websearch_to_tsquery (поддерживаются "фразы", OR и -исключения)
+    в русской и английской конфигурациях и ищется по GIN-индексу search_vector.
+    Результаты отсортированы по релевантности (совпадение в названии весит
+    больше, чем в описании); следующая страница - по курсору из X-Next-Cursor.
+    """
+    try:
+        ts_query = func.websearch_to_tsquery("russian", q).op("||")(func.websearch_to_tsquery("english", q))
+        rank = func.ts_rank_cd(Product.search_vector, ts_query, type_=Float).label("rank")
+        keys = [rank, Product.id]
+
+        stmt = apply_keyset(
+            select(Product, rank)
+            .where(Product.search_vector.op("@@")(ts_query))
+            .options(*eager_options(Product, ProductWithCategory)),
+            keys, after, limit, descending=True
+        )
+
+        rows = (await db.execute(stmt)).all()
+        headers = {}
+        if len(rows) > limit and limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor([rows[-1].rank, rows[-1].Product.id])
+        return json_response(dump_list(ProductWithCategory, [row.Product for row in rows]), headers)
+
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при поиске товаров по запросу '{q}': {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Внутренняя ошибка сервера"
+        )
+
+
+# Сколько строк забирается из серверного курсора за один раз при экспорте
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = list(ProductInDB.model_fields)
+
+
+async def _export_rows(session_factory, filters: ProductFilter, fmt: str):
+    """
+    Генератор тела экспорта. Строки читаются серверным курсором
+    (stream + yield_per), поэтому в памяти одновременно находится только
+    одна пачка, а первые байты уходят клиенту сразу после первой пачки.
+
+    Сессия открывается здесь, а не через Depends(get_db): зависимость
+    закрывается до того, как начнётся отправка потокового ответа.
+    """
+    if fmt == "csv":
+        # Заголовок отправляем до запроса к БД
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+
+    stmt = (
+        select(Product)
+        .where(*product_conditions(filters))
+        .order_by(Product.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    try:
+        async with session_factory() as session:
+            result = await session.stream_scalars(stmt)
+            async for batch in result.partitions():
+                if fmt == "ndjson":
+                    yield "".join(ProductInDB.model_validate(p).model_dump_json() + "\n" for p in batch)
+                else:
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    for p in batch:
+                        writer.writerow(ProductInDB.model_validate(p).model_dump(mode="json").values())
+                    yield buffer.getvalue()
+    except Exception as e:
+        # Заголовки уже отправлены, поменять статус ответа нельзя - только обрываем поток
+        logger.error(f"Ошибка при экспорте товаров: {str(e)}")
+        raise
+
+
+@router.get("/export")
+async def export_products(
+        request: Request,
+        format: Literal["ndjson", "csv"] = "ndjson",
+        filters: ProductFilter = Depends(get_product_filter),
+):
+    """
+    Выгрузка всего каталога (или его части по фильтрам) одним потоковым ответом.
+
+    Формат - NDJSON (по объекту ProductInDB на строку) или CSV с заголовком.
+    Товары отдаются в порядке id; память сервера не зависит от размера каталога.
+    """
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    session_factory = await choose_read_sessionmaker(request)
+    return StreamingResponse(
+        _export_rows(session_factory, filters, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
+    )
+
+
+@router.get("/{product_id}", response_model=ProductWithCategory)
+async def get_product(
+        product_id: int,
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получить карточку товара.
+    Поддерживает условные запросы: версия строки (updated_at) проверяется
+    лёгким запросом, и при совпадении возвращается 304 без загрузки товара.
+    """
+    try:
+        result = await db.execute(select(Product.updated_at).where(Product.id == product_id))
+        version = result.first()
+        if version is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Товар не найден"
+            )
+
+        last_modified = version.updated_at
+        etag = make_etag(product_id, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        result = await db.execute(
+            select(Product)
+            .where(Product.id == product_id)
+            .options(*eager_options(Product, ProductWithCategory))
+        )
+        product = result.scalar_one()
+        response.headers.update(validator_headers(etag, last_modified))
+        return product
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при получении товара {product_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Внутренняя ошибка сервера"
+        )
@@ -1,53 +1,81 @@
+import asyncio
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
-from typing import List
+from typing import Annotated, List
 
-from database.database import get_db
+from cache import invalidate_on_commit, make_key, users_cache
+from database.crud import update_many_returning, update_returning
+from database.database import AsyncSessionLocal, get_db, get_read_db
 from database.models.user import User
-from schemas.user import UserCreate, UserInDB, UserUpdate
+from database.pagination import InvalidCursorError, apply_keyset, split_page
+from schemas.user import (UserBulkCreateResult, UserBulkSkipped, UserBulkUpdate, UserBulkUpdateResult, UserCreate,
+                          UserInDB, UserLogin, UserUpdate)
+from security import HASH_WORKERS, hash_password, needs_rehash, verify_dummy_password, verify_password
 from logger import logger
+from .serialization import dump_list, json_response
 
 router = APIRouter()
 
+# Ключ сортировки списка пользователей (первичный ключ уже проиндексирован)
+USER_SORT_KEY = [User.id]
+# Сколько паролей массовой регистрации хешируется одновременно (по размеру пула хеширования)
+BULK_HASH_BATCH = HASH_WORKERS
+
+
+def _user_values(user: UserCreate, hashed_password: str) -> dict:
+    """Значения колонок users для новой записи."""
+    return dict(
+        username=user.username,
+        email=user.email,
+        firstname=user.firstname,
+        last_name=user.last_name,
+        birthday=user.birthday,
+        hashed_password=hashed_password
+    )
+
 
 @router.post("/", response_model=UserInDB, status_code=status.HTTP_201_CREATED)
 async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    """Создание нового пользователя"""
+    """
+    Создание нового пользователя.
+    Один запрос INSERT ... ON CONFLICT DO NOTHING RETURNING: если имя или
+    email заняты, строка не вставляется и RETURNING пуст. В отличие от
+    предварительного SELECT, проверка не подвержена гонке двух регистраций.
+    """
     try:
-        # Проверяем, существует ли пользователь с таким username или email
-        existing_user = await db.execute(
-            select(User).where(
-                (User.username == user.username) |
-                (User.email == user.email)
-            ))
-        if existing_user.scalar():
+        # Хешируем пароль в пуле потоков (scrypt занимает десятки миллисекунд CPU)
+        hashed_password = await hash_password(user.password)
+
+        result = await db.execute(
+            pg_insert(User)
+            .values(**_user_values(user, hashed_password))
+            .on_conflict_do_nothing()
+            .returning(User)
+        )
+        db_user = result.scalar()
+        if db_user is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Пользователь с таким именем или email уже существует"
             )
 
-        # Хешируем пароль (в реальном проекте используйте passlib или аналоги)
-        hashed_password = f"hashed_{user.password}"  # Замените на реальное хеширование
-
-        # Создаём объект пользователя для БД
-        db_user = User(
-            username=user.username,
-            email=user.email,
-            firstname=user.firstname,
-            last_name=user.last_name,
-            birthday=user.birthday,
-            hashed_password=hashed_password
-        )
-
-        db.add(db_user)
-        await db.commit()
-        await db.refresh(db_user)
-
         logger.info(f"Создан новый пользователь: {user.username}")
         return db_user
 
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        # Нарушены проверки таблицы (формат email, дата рождения в будущем)
+        logger.error(f"Некорректные данные пользователя {user.username}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Данные пользователя не прошли проверку"
+        )
     except Exception as e:
         logger.error(f"Ошибка при создании пользователя: {str(e)}")
         raise HTTPException(
@@ -56,21 +84,135 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
         )
 
 
-@router.get("/", response_model=List[UserInDB])
-async def get_users(
-        skip: int = 0,
-        limit: int = 10,
+@router.post("/bulk", response_model=UserBulkCreateResult, status_code=status.HTTP_201_CREATED)
+async def create_users_bulk(
+        users: Annotated[List[UserCreate], Body(min_length=1, max_length=10000)],
         db: AsyncSession = Depends(get_db)
 ):
-    """Получение списка пользователей"""
+    """
+    Массовая регистрация (для миграций). Все пользователи вставляются одним
+    пакетным INSERT ... ON CONFLICT DO NOTHING RETURNING (SQLAlchemy
+    разбивает его на многострочные VALUES по 1000 строк).
+
+    Пропущенные записи перечисляются в skipped с номером и причиной:
+    повтор имени или email внутри запроса (duplicate - остаётся первая
+    запись) или уже занятые имя/email в базе (exists). Повторы отсекаются
+    до хеширования и вставки, поэтому каждое имя во вставке уникально
+    и созданные записи однозначно сопоставляются с запросом.
+    """
+    accepted: list[tuple[int, UserCreate]] = []
+    skipped: list[UserBulkSkipped] = []
+    seen_usernames, seen_emails = set(), set()
+    for index, user in enumerate(users):
+        if user.username in seen_usernames or user.email in seen_emails:
+            skipped.append(UserBulkSkipped(index=index, username=user.username, reason="duplicate"))
+            continue
+        seen_usernames.add(user.username)
+        seen_emails.add(user.email)
+        accepted.append((index, user))
+
     try:
+        # Хешируем пачками по размеру пула: очередь пула остаётся короткой,
+        # и входы и регистрации других клиентов не ждут окончания всей пачки
+        hashes = []
+        for start in range(0, len(accepted), BULK_HASH_BATCH):
+            batch = accepted[start:start + BULK_HASH_BATCH]
+            hashes += await asyncio.gather(*(hash_password(user.password) for _, user in batch))
+
         result = await db.execute(
-            select(User)
-            .offset(skip)
-            .limit(min(limit, 100))
+            pg_insert(User).on_conflict_do_nothing().returning(User),
+            [_user_values(user, hashed) for (_, user), hashed in zip(accepted, hashes)]
+        )
+        created = result.scalars().all()
+        created_names = {u.username for u in created}
+        skipped += [
+            UserBulkSkipped(index=index, username=user.username, reason="exists")
+            for index, user in accepted if user.username not in created_names
+        ]
+        skipped.sort(key=lambda s: s.index)
+
+        logger.info(f"Массовая регистрация: создано {len(created)}, пропущено {len(skipped)}")
+        return UserBulkCreateResult(created=created, skipped=skipped)
+
+    except IntegrityError as e:
+        logger.error(f"Некорректные данные при массовой регистрации: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Данные пользователей не прошли проверку"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при массовой регистрации: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при массовой регистрации"
+        )
+
+
+@router.post("/login", response_model=UserInDB)
+async def login_user(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
+    """
+    Проверка имени пользователя и пароля.
+    Если хеш пароля создан устаревшим способом или с прежними параметрами
+    стоимости, он прозрачно пересчитывается с текущими параметрами.
+    """
+    try:
+        result = await db.execute(select(User).where(User.username == credentials.username))
+        user = result.scalar()
+        if user is None:
+            # Неизвестное имя проверяется так же долго, как известное: время
+            # ответа не должно выдавать, существует ли пользователь
+            await verify_dummy_password(credentials.password)
+        if not user or not await verify_password(credentials.password, user.hashed_password):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Неверное имя пользователя или пароль"
+            )
+
+        if needs_rehash(user.hashed_password):
+            new_hash = await hash_password(credentials.password)
+            await db.execute(
+                update(User)
+                .where(User.id == user.id, User.hashed_password == user.hashed_password)
+                .values(hashed_password=new_hash)
+            )
+            logger.info(f"Пароль пользователя {user.id} перехеширован с новыми параметрами")
+        return user
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при входе пользователя {credentials.username}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при входе"
+        )
+
+
+@router.get("/", response_model=List[UserInDB])
+async def get_users(
+        skip: int = Query(0, ge=0, description="Сколько пользователей пропустить (без курсора)"),
+        limit: int = Query(10, ge=1, le=100, description="Размер страницы"),
+        after: str | None = None,
+        db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Получение списка пользователей.
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor
+    и передаётся обратно в параметре after (skip при этом игнорируется).
+    """
+    try:
+        stmt = apply_keyset(select(User), USER_SORT_KEY, after, limit)
+        if after is None and skip:
+            stmt = stmt.offset(skip)
+        result = await db.execute(stmt)
+        users, next_cursor = split_page(result.scalars().all(), USER_SORT_KEY, limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        # Готовый JSON: FastAPI не валидирует и не сериализует список повторно
+        return json_response(dump_list(UserInDB, users), headers)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        users = result.scalars().all()
-        return users
     except Exception as e:
         logger.error(f"Ошибка при получении пользователей: {str(e)}")
         raise HTTPException(
@@ -80,17 +222,28 @@ async def get_users(
 
 
 @router.get("/{user_id}", response_model=UserInDB)
-async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
-    """Получение информации о конкретном пользователе"""
-    try:
+async def get_user(user_id: int):
+    """
+    Получение информации о конкретном пользователе.
+    Профиль кэшируется готовым JSON (users_cache) и сбрасывается при обновлении;
+    при промахе читается с основной БД, как всё, что попадает в кэш.
+    """
+    async def load_user(db: AsyncSession):
         result = await db.execute(select(User).where(User.id == user_id))
         user = result.scalar()
-        if not user:
+        # Отсутствующего пользователя не кэшируем: он может быть создан в любой момент
+        return UserInDB.model_validate(user).model_dump_json() if user else None
+
+    try:
+        body = await users_cache.get_or_load(make_key("item", user_id), load_user, AsyncSessionLocal)
+        if body is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Пользователь не найден"
             )
-        return user
+        return json_response(body.encode())
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при получении пользователя {user_id}: {str(e)}")
         raise HTTPException(
@@ -105,28 +258,65 @@ async def update_user(
         user_data: UserUpdate,
         db: AsyncSession = Depends(get_db)
 ):
-    """Обновление информации о пользователе"""
+    """
+    Обновление информации о пользователе.
+    Меняются только переданные поля; запись обновляется и возвращается
+    одним запросом UPDATE ... RETURNING.
+    """
     try:
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar()
+        user = await update_returning(db, User, user_id, user_data.model_dump(exclude_unset=True))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Пользователь не найден"
             )
 
-        # Обновляем только переданные поля
-        update_data = user_data.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(user, field, value)
-
-        await db.commit()
-        await db.refresh(user)
+        await invalidate_on_commit(db, users_cache, [user_id])
         logger.info(f"Обновлён пользователь {user_id}")
         return user
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        logger.error(f"Некорректные данные при обновлении пользователя {user_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email уже занят или данные не прошли проверку"
+        )
     except Exception as e:
         logger.error(f"Ошибка при обновлении пользователя {user_id}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ошибка при обновлении пользователя"
         )
+
+
+@router.patch("/", response_model=UserBulkUpdateResult)
+async def update_users_bulk(
+        data: UserBulkUpdate,
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Применяет одни и те же изменения к нескольким пользователям одним
+    запросом UPDATE ... WHERE id = ANY(:ids) RETURNING.
+    Несуществующие id перечисляются в missing.
+    """
+    try:
+        users = await update_many_returning(db, User, data.ids, data.changes.model_dump(exclude_unset=True))
+        found = {u.id for u in users}
+        missing = [user_id for user_id in dict.fromkeys(data.ids) if user_id not in found]
+        await invalidate_on_commit(db, users_cache, found)
+
+        logger.info(f"Массовое обновление пользователей: обновлено {len(users)}, не найдено {len(missing)}")
+        return UserBulkUpdateResult(updated=users, missing=missing)
+    except IntegrityError as e:
+        logger.error(f"Некорректные данные при массовом обновлении пользователей: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email уже занят или данные не прошли проверку"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при массовом обновлении пользователей: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при обновлении пользователей"
+        )
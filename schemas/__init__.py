@@ -1,25 +1,59 @@
 # Делаем все схемы доступными через from schemas import ...
-from .base import BaseSchema
-from .user import UserBase, UserCreate, UserUpdate, UserInDB, UserLogin
-from .category import CategoryBase, CategoryCreate, CategoryUpdate, CategoryInDB
-from .product import ProductBase, ProductCreate, ProductUpdate, ProductInDB, ProductWithReviews
-from .order import OrderBase, OrderCreate, OrderUpdate, OrderInDB, OrderWithItems, OrderItemBase, OrderItemCreate, OrderItemInDB
-from .review import ReviewBase, ReviewCreate, ReviewUpdate, ReviewInDB, ReviewWithUser
-from .relations import *
-
-# Для избежания циклических импортов
+#
+# Модули схем импортируются лениво, при первом обращении к имени
+# (schemas.UserInDB, from schemas import UserInDB): импорт одного модуля
+# (from schemas.user import ...) не тянет за собой все остальные.
+# Сами схемы тоже собираются лениво - см. defer_build в schemas/base.py.
+import importlib
 from typing import TYPE_CHECKING
+
+# Имя схемы -> модуль пакета, в котором она объявлена
+_EXPORTS = {
+    'BaseSchema': 'base',
+    **dict.fromkeys([
+        'UserBase', 'UserCreate', 'UserUpdate', 'UserInDB', 'UserLogin', 'UserBulkSkipped',
+        'UserBulkCreateResult', 'UserBulkUpdate', 'UserBulkUpdateResult',
+    ], 'user'),
+    **dict.fromkeys(['CategoryBase', 'CategoryCreate', 'CategoryUpdate', 'CategoryInDB'], 'category'),
+    **dict.fromkeys([
+        'ProductBase', 'ProductCreate', 'ProductUpdate', 'ProductInDB', 'ProductWithReviews',
+        'ProductFilter', 'CategoryFacet', 'PriceBucketFacet', 'ProductFacets',
+    ], 'product'),
+    **dict.fromkeys([
+        'OrderBase', 'OrderCreate', 'OrderUpdate', 'OrderInDB', 'OrderWithItems', 'OrderItemBase',
+        'OrderItemCreate', 'OrderItemInDB',
+    ], 'order'),
+    **dict.fromkeys(['ReviewBase', 'ReviewCreate', 'ReviewUpdate', 'ReviewInDB', 'ReviewWithUser'], 'review'),
+    **dict.fromkeys(['ProductWithCategory', 'CategoryWithProducts'], 'relations'),
+    **dict.fromkeys(['ImportRowError', 'ImportReport'], 'bulk'),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # Следующие обращения не проходят через __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+# Для IDE и проверки типов - обычные импорты
 if TYPE_CHECKING:
-    from .user import UserInDB
-    from .category import CategoryInDB
-    from .product import ProductInDB
-    from .review import ReviewInDB
-
-__all__ = [
-    'BaseSchema',
-    'UserBase', 'UserCreate', 'UserUpdate', 'UserInDB', 'UserLogin',
-    'CategoryBase', 'CategoryCreate', 'CategoryUpdate', 'CategoryInDB', 'CategoryWithProducts',
-    'ProductBase', 'ProductCreate', 'ProductUpdate', 'ProductInDB', 'ProductWithCategory', 'ProductWithReviews',
-    'OrderBase', 'OrderCreate', 'OrderUpdate', 'OrderInDB', 'OrderWithItems', 'OrderItemBase', 'OrderItemCreate', 'OrderItemInDB',
-    'ReviewBase', 'ReviewCreate', 'ReviewUpdate', 'ReviewInDB', 'ReviewWithUser'
-]
\ No newline at end of file
+    from .base import BaseSchema
+    from .user import (UserBase, UserCreate, UserUpdate, UserInDB, UserLogin, UserBulkSkipped,
+                       UserBulkCreateResult, UserBulkUpdate, UserBulkUpdateResult)
+    from .category import CategoryBase, CategoryCreate, CategoryUpdate, CategoryInDB
+    from .product import (ProductBase, ProductCreate, ProductUpdate, ProductInDB, ProductWithReviews,
+                          ProductFilter, CategoryFacet, PriceBucketFacet, ProductFacets)
+    from .order import (OrderBase, OrderCreate, OrderUpdate, OrderInDB, OrderWithItems, OrderItemBase,
+                        OrderItemCreate, OrderItemInDB)
+    from .review import ReviewBase, ReviewCreate, ReviewUpdate, ReviewInDB, ReviewWithUser
+    from .relations import ProductWithCategory, CategoryWithProducts
+    from .bulk import ImportRowError, ImportReport
@@ -74,4 +74,7 @@ class BaseSchema(BaseModel):
         populate_by_name=True,  # Разрешает alias в полях
         str_strip_whitespace=True,  # Автоматически обрезает пробелы в строках
         str_min_length=1,  # Минимальная длина строк по умолчанию
+        # Валидатор собирается при первом использовании схемы, а не при импорте:
+        # схемы, которые воркеру не понадобились, не замедляют старт
+        defer_build=True,
     )
@@ -0,0 +1,22 @@
+from pydantic import Field
+
+from .base import BaseSchema
+
+
+class ImportRowError(BaseSchema):
+    """Ошибка в одной строке импортируемого файла."""
+    line: int = Field(..., description="Номер строки в файле (с 1, для CSV с учётом заголовка)")
+    errors: list[str] = Field(..., description="Описание ошибок строки")
+
+
+class ImportReport(BaseSchema):
+    """Итог массового импорта."""
+    total: int = Field(0, description="Всего строк данных в файле")
+    inserted: int = Field(0, description="Создано новых записей")
+    updated: int = Field(0, description="Обновлено существующих записей (по slug)")
+    failed: int = Field(0, description="Строк с ошибками")
+    errors: list[ImportRowError] = Field(
+        default_factory=list,
+        description="Ошибки по строкам (не больше MAX_REPORTED_ERRORS)"
+    )
+    errors_truncated: bool = Field(False, description="Список ошибок обрезан")
@@ -1,6 +1,6 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Annotated, Optional, List
+from typing import Annotated, ClassVar, Optional, List
 from pydantic import Field, field_validator
 from .base import BaseSchema
 
@@ -126,6 +126,9 @@ class OrderInDB(OrderBase):
 
 class OrderWithItems(OrderInDB):
     """Схема заказа с вложенными позициями."""
+    # Связи, которые роутер должен загрузить заранее (см. database/loading.py)
+    eager_load: ClassVar[dict[str, str]] = {"items": "selectin"}
+
     items: List[OrderItemInDB] = Field(
         ...,
         description="Список позиций в заказе"
@@ -1,6 +1,6 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Annotated, Optional
+from typing import Annotated, ClassVar, Optional
 from pydantic import Field, field_validator
 
 from .base import BaseSchema, SlugStr
@@ -152,11 +152,81 @@ class ProductInDB(ProductBase):
     created_at: datetime = Field(..., description="Дата создания")
     updated_at: datetime = Field(..., description="Дата последнего обновления")
     category_id: int = Field(..., description="ID категории")
+    rating_count: int = Field(0, description="Количество отзывов")
+    rating_average: float = Field(0, description="Средняя оценка (0, если отзывов нет)")
+    rating_histogram: list[int] = Field(
+        default_factory=lambda: [0] * 5,
+        description="Количество отзывов с оценками 1, 2, 3, 4, 5"
+    )
 
 
 class ProductWithReviews(ProductInDB):
     """Схема продукта с отзывами."""
+    # Связи, которые роутер должен загрузить заранее (см. database/loading.py)
+    eager_load: ClassVar[dict[str, str]] = {"reviews": "selectin"}
+
     reviews: list["ReviewInDB"] = Field(
         default_factory=list,
         description="Список отзывов о товаре"
     )
+
+
+class ProductFilter(BaseSchema):
+    """Фильтры каталога (query-параметры списка товаров и фасетов)."""
+    category_id: Annotated[
+        Optional[int],
+        Field(
+            None,
+            gt=0,
+            description="ID категории"
+        )
+    ] = None
+    min_price: Annotated[
+        Optional[Decimal],
+        Field(
+            None,
+            ge=0,
+            description="Минимальная цена (с учётом скидки)"
+        )
+    ] = None
+    max_price: Annotated[
+        Optional[Decimal],
+        Field(
+            None,
+            ge=0,
+            description="Максимальная цена (с учётом скидки)"
+        )
+    ] = None
+    is_active: Annotated[
+        Optional[bool],
+        Field(
+            None,
+            description="Только активные (true) или только неактивные (false) товары"
+        )
+    ] = None
+    in_stock: Annotated[
+        Optional[bool],
+        Field(
+            None,
+            description="Только товары в наличии (stock > 0)"
+        )
+    ] = None
+
+
+class CategoryFacet(BaseSchema):
+    """Количество товаров в категории."""
+    category_id: int | None = Field(None, description="ID категории")
+    count: int = Field(..., description="Количество товаров")
+
+
+class PriceBucketFacet(BaseSchema):
+    """Количество товаров в ценовом диапазоне [min_price, max_price)."""
+    min_price: Decimal = Field(..., description="Нижняя граница диапазона (включительно)")
+    max_price: Decimal | None = Field(None, description="Верхняя граница диапазона (не включительно)")
+    count: int = Field(..., description="Количество товаров")
+
+
+class ProductFacets(BaseSchema):
+    """Фасеты каталога для текущих фильтров."""
+    categories: list[CategoryFacet] = Field(default_factory=list, description="Товары по категориям")
+    price_buckets: list[PriceBucketFacet] = Field(default_factory=list, description="Товары по ценовым диапазонам")
@@ -1,5 +1,5 @@
 from datetime import date
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import Field, EmailStr
 
@@ -83,3 +83,38 @@ class UserLogin(BaseSchema):
     """Схема для входа пользователя."""
     username: UsernameStr = Field(..., description="Имя пользователя или email")
     password: str = Field(..., description="Пароль", min_length=1)
+
+
+class UserBulkSkipped(BaseSchema):
+    """Пропущенная запись массовой регистрации."""
+    index: int = Field(..., description="Номер записи в запросе (с 0)")
+    username: str = Field(..., description="Имя пользователя из записи")
+    reason: Literal["duplicate", "exists"] = Field(
+        ...,
+        description="duplicate - имя или email повторяют более раннюю запись запроса, "
+                    "exists - имя или email уже заняты в базе"
+    )
+
+
+class UserBulkCreateResult(BaseSchema):
+    """Результат массовой регистрации."""
+    created: list[UserInDB] = Field(default_factory=list, description="Созданные пользователи")
+    skipped: list[UserBulkSkipped] = Field(default_factory=list, description="Пропущенные записи")
+
+
+class UserBulkUpdate(BaseSchema):
+    """Одинаковые изменения для нескольких пользователей."""
+    ids: list[int] = Field(
+        ...,
+        min_length=1,
+        max_length=10000,
+        description="ID пользователей",
+        examples=[[1, 2, 3]]
+    )
+    changes: UserUpdate = Field(..., description="Изменяемые поля")
+
+
+class UserBulkUpdateResult(BaseSchema):
+    """Результат массового обновления."""
+    updated: list[UserInDB] = Field(default_factory=list, description="Обновлённые пользователи")
+    missing: list[int] = Field(default_factory=list, description="ID, для которых пользователь не найден")
@@ -0,0 +1,127 @@
+# Хеширование паролей.
+#
+# Используется scrypt из стандартной библиотеки (hashlib) - KDF с настраиваемой
+# стоимостью по CPU и памяти. Одно хеширование занимает десятки-сотни
+# миллисекунд, поэтому оно выполняется в ограниченном пуле потоков: hashlib
+# отпускает GIL на время вычисления, и цикл событий uvicorn продолжает
+# обслуживать другие запросы.
+#
+# Формат хеша: scrypt$<n>$<r>$<p>$<соль base64>$<хеш base64>
+# Параметры хранятся в самом хеше, поэтому при их изменении старые хеши
+# продолжают проверяться, а при следующем входе пароль перехешируется
+# (needs_rehash).
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Параметры стоимости scrypt (можно поднять без миграции - см. needs_rehash)
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))  # CPU/память, степень двойки
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))  # Размер блока
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))  # Параллелизм
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Сколько хеширований может идти одновременно (остальные ждут в очереди пула)
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Префикс временных «хешей» из первой версии create_user
+LEGACY_PREFIX = "hashed_"
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+    return _executor
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n, r=r, p=p,
+        maxmem=256 * r * (n + p + 2),  # С запасом над 128 * r * (n + p + 2)
+        dklen=HASH_BYTES
+    )
+
+
+def hash_password_sync(password: str, n: int = None, r: int = None, p: int = None) -> str:
+    """Синхронное хеширование. В обработчиках запросов используйте hash_password."""
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, n, r, p)
+    return "$".join([
+        "scrypt", str(n), str(r), str(p),
+        base64.b64encode(salt).decode(),
+        base64.b64encode(digest).decode(),
+    ])
+
+
+def verify_password_sync(password: str, hashed: str) -> bool:
+    """Синхронная проверка пароля (понимает и устаревший формат hashed_<пароль>)."""
+    if hashed.startswith(LEGACY_PREFIX):
+        return hmac.compare_digest(hashed.encode(), (LEGACY_PREFIX + password).encode())
+    try:
+        algorithm, n, r, p, salt, digest = hashed.split("$")
+        if algorithm != "scrypt":
+            return False
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash() -> str:
+    """Хеш случайного пароля с текущими параметрами (считается один раз на процесс)."""
+    return hash_password_sync(base64.b64encode(os.urandom(SALT_BYTES)).decode())
+
+
+def _verify_dummy_sync(password: str) -> bool:
+    verify_password_sync(password, _dummy_hash())
+    return False
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True, если хеш создан устаревшим способом или с другими параметрами стоимости."""
+    parts = hashed.split("$")
+    if len(parts) != 6 or parts[0] != "scrypt":
+        return True
+    return parts[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+async def hash_password(password: str) -> str:
+    """Хеширует пароль в пуле потоков, не блокируя цикл событий."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), hash_password_sync, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Проверяет пароль в пуле потоков, не блокируя цикл событий."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), verify_password_sync, password, hashed)
+
+
+async def verify_dummy_password(password: str) -> bool:
+    """
+    Проверка пароля для несуществующего пользователя: та же работа scrypt,
+    что и для настоящего, и всегда False. Без неё ответ на неизвестное имя
+    приходит заметно быстрее, и по времени можно перебирать имена пользователей.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _verify_dummy_sync, password)
+
+
+def shutdown() -> None:
+    """Останавливает пул хеширования (вызывается при остановке приложения)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,59 @@
+# Границы пагинации: пустая страница и проверка limit/skip в эндпоинтах.
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+
+from database.models.user import User
+from database.pagination import split_page
+
+
+def test_split_page_zero_limit():
+    rows = [SimpleNamespace(id=1), SimpleNamespace(id=2)]
+    assert split_page(rows, [User.id], 0) == ([], None)
+
+
+def test_split_page_next_cursor():
+    rows = [SimpleNamespace(id=1), SimpleNamespace(id=2), SimpleNamespace(id=3)]
+    page, cursor = split_page(rows, [User.id], 2)
+    assert page == rows[:2]
+    assert cursor is not None
+
+
+@pytest.fixture(scope="module")
+def app():
+    from routers import products, users
+
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    app.include_router(products.router)
+    return app
+
+
+def _status(app, path: str, query: str) -> int:
+    """Код ответа на GET без HTTP-клиента: запрос передаётся приложению напрямую по ASGI."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [], "client": ("test", 0), "server": ("test", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return next(m["status"] for m in messages if m["type"] == "http.response.start")
+
+
+@pytest.mark.parametrize("path, query", [
+    ("/users/", "limit=0"), ("/users/", "limit=101"), ("/users/", "skip=-1"),
+    ("/products/products", "limit=0"), ("/products/products", "limit=101"), ("/products/products", "skip=-1"),
+    ("/products/search", "q=x&limit=0"), ("/products/search", "q=x&limit=101"),
+])
+def test_pagination_bounds_rejected(app, path, query):
+    assert _status(app, path, query) == 422